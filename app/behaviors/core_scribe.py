@@ -1,17 +1,14 @@
-import os, aiofiles, datetime
+import os
+from app.infra.artifacts import save
 
 ART_DIR = os.environ.get("QIL_ART_DIR", "artifacts")
 
 async def run(vot, ctx):
-    os.makedirs(ART_DIR, exist_ok=True)
     day = vot["Day"]
     path = os.path.join(ART_DIR, f"day{day:03d}_core_axiom.txt")
     axiom = f"""Core Scribe Entry
-Date: {datetime.datetime.utcnow().isoformat()}
+Date: {vot.get('Date', '')}
 Embedded remembrance axiom into Tyme Core.
 """
-    async with aiofiles.open(path, "w") as f:
-        await f.write(axiom)
-    from app.infra.storage_supabase import upload_file
-    url = upload_file(path)
+    url = await save(path, axiom)
     return {"files_created": 1, "artifact_url": url}
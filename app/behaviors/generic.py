@@ -1,15 +1,12 @@
-import os, aiofiles, datetime
+import os
+from app.infra.artifacts import save
 
 ART_DIR = os.environ.get("QIL_ART_DIR", "artifacts")
 
 async def run(vot, ctx):
-    os.makedirs(ART_DIR, exist_ok=True)
     day = vot["Day"]
     name = vot["VOT Name"]
     deliverable = vot["Primary Deliverable"]
     path = os.path.join(ART_DIR, f"day{day:03d}_generic.txt")
-    async with aiofiles.open(path, "w") as f:
-        await f.write(f"[{datetime.datetime.utcnow().isoformat()}] AUTO DRAFT\n{name}\nDeliverable: {deliverable}\n")
-        from app.infra.storage_supabase import upload_file
-    url = upload_file(path)
+    url = await save(path, f"[{vot.get('Date', '')}] AUTO DRAFT\n{name}\nDeliverable: {deliverable}\n")
     return {"files_created": 1, "artifact_url": url}
@@ -1,10 +1,10 @@
-import os, aiofiles, datetime
+import os
+from app.infra.artifacts import save
 
 ART_DIR = os.environ.get("QIL_ART_DIR", "artifacts")
 
 async def run(vot, ctx):
     # Stub: create claims scaffold
-    os.makedirs(ART_DIR, exist_ok=True)
     day = vot["Day"]
     path = os.path.join(ART_DIR, f"day{day:03d}_patent_claims.txt")
     claims = [
@@ -12,8 +12,5 @@ async def run(vot, ctx):
         "2. The system of claim 1 wherein ...",
         "3. A method of atmospheric ammonia synthesis comprising ..."
     ]
-    async with aiofiles.open(path, "w") as f:
-        await f.write("\n".join(claims))
-        from app.infra.storage_supabase import upload_file
-    url = upload_file(path)
+    url = await save(path, "\n".join(claims))
     return {"files_created": 1, "artifact_url": url, "claims": len(claims)}
@@ -1,19 +1,16 @@
-import os, aiofiles, datetime
+import os
+from app.infra.artifacts import save
 
 ART_DIR = os.environ.get("QIL_ART_DIR", "artifacts")
 
 async def run(vot, ctx):
-    os.makedirs(ART_DIR, exist_ok=True)
     day = vot["Day"]
     path = os.path.join(ART_DIR, f"day{day:03d}_symbol_notes.txt")
     content = f"""Symbol Keeper Notes
-Timestamp: {datetime.datetime.utcnow().isoformat()}
+Date: {vot.get('Date', '')}
 Role: Symbol Keeper
 Deliverable: {vot['Primary Deliverable']}
 Outline: Steps to design and integrate symbolic elements.
 """
-    async with aiofiles.open(path, "w") as f:
-        await f.write(content)
-    from app.infra.storage_supabase import upload_file
-    url = upload_file(path)
+    url = await save(path, content)
     return {"files_created": 1, "artifact_url": url}
@@ -0,0 +1,278 @@
+import os, sys, csv, time, json, random, hashlib, asyncio, argparse, resource, tempfile, subprocess
+from pathlib import Path
+
+from app.executors import ProcessRunner, as_coroutine
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DAG_SIZES = (365, 10_000, 100_000, 1_000_000)
+
+
+def cpu_burn(vot: dict, ctx) -> dict:
+    # synthetic CPU-bound behavior: a chain of sha256 rounds
+    h = str(vot["Day"]).encode()
+    for _ in range(ctx.get("rounds", 200_000)):
+        h = hashlib.sha256(h).digest()
+    return {"digest": h.hex()[:16]}
+
+
+async def _drive(run, jobs: int, concurrency: int, rounds: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(day):
+        async with sem:
+            await run({"Day": day}, {"rounds": rounds})
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(d) for d in range(1, jobs + 1)))
+    return time.perf_counter() - t0
+
+
+def bench_process(jobs: int, concurrency: int, rounds: int, workers: int) -> dict:
+    """Same CPU-bound behavior run inline on the loop, on threads and in the process pool."""
+    results = {}
+
+    async def inline(vot, ctx):
+        return cpu_burn(vot, ctx)
+
+    results["async"] = asyncio.run(_drive(inline, jobs, concurrency, rounds))
+    results["thread"] = asyncio.run(_drive(as_coroutine(cpu_burn, "thread", ""), jobs, concurrency, rounds))
+
+    runner = ProcessRunner(workers=workers).start()
+    try:
+        run = as_coroutine(cpu_burn, "process", "app.bench:cpu_burn", runner)
+        results["process"] = asyncio.run(_drive(run, jobs, concurrency, rounds))
+    finally:
+        runner.shutdown()
+    return {
+        "bench": "process",
+        "jobs": jobs, "concurrency": concurrency, "rounds": rounds, "workers": workers,
+        "seconds": results,
+        "speedup_vs_async": {k: results["async"] / v for k, v in results.items()},
+    }
+
+
+def synth_plan(path: str, nodes: int, fan_in: int = 3, depth: int = 50, seed: int = 0) -> dict:
+    """Write a layered random DAG in the plan CSV format.
+
+    Days are split into `depth` layers; each day outside the first layer
+    depends on 1..`fan_in` days of the layer before, so the critical path is
+    exactly `depth` jobs long.
+    """
+    rng = random.Random(seed)
+    depth = max(1, min(depth, nodes))
+    width = -(-nodes // depth)
+    edges = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Day", "Date", "Theme", "VOT Name", "Primary Deliverable", "Key Metrics (template)",
+                    "Status", "Dependencies (Day #)"])
+        for i in range(nodes):
+            day, layer = i + 1, i // width
+            deps = []
+            if layer:
+                lo = (layer - 1) * width + 1
+                deps = rng.sample(range(lo, lo + width), rng.randint(1, fan_in))
+            edges += len(deps)
+            w.writerow([day, f"2025-01-{day % 28 + 1:02d}", f"Theme {layer % 12}", f"Bench – Day {day}",
+                        "Synthetic artifact", "jobs", "Open", ", ".join(map(str, deps))])
+    return {"nodes": nodes, "edges": edges, "depth": -(-nodes // width), "fan_in": fan_in}
+
+
+def _pct(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB elsewhere
+
+
+def bench_dag_once(csv_path: str, concurrency: int, job_ms: float, upload_ms: float, db_ms: float,
+                   db: str = "fake", lag_interval: float = 0.01) -> dict:
+    """One orchestrator run over `csv_path` with latency-injecting fakes.
+
+    The behavior sleeps `job_ms` and hands a file to the real upload pipeline,
+    whose `upload_file` is replaced by a `upload_ms` sleep. With `db="fake"`
+    the ledger calls the orchestrator makes block for `db_ms` each; with
+    `db="sqlite"` the real single-writer ledger is used. Meant to run in a
+    fresh process (see `bench_dag`) so RSS and module state are per run.
+    """
+    import app.orchestrator as orchestrator
+    from app.infra import storage_supabase
+    from app.registry import registry
+
+    artifact = Path("bench_artifact.txt")
+    artifact.write_text("bench\n", encoding="utf-8")
+    latencies = []
+
+    async def bench_behavior(vot, ctx):
+        t0 = time.perf_counter()
+        if job_ms:
+            await asyncio.sleep(job_ms / 1000)
+        url = await orchestrator_upload(str(artifact))
+        latencies.append(time.perf_counter() - t0)
+        return {"files_created": 1, "artifact_url": url}
+
+    from app.infra.uploads import upload as orchestrator_upload
+    registry.register("Bench", bench_behavior, "app.bench (synthetic)")
+
+    def fake_upload(local_path, dest_prefix="artifacts", force=False):
+        time.sleep(upload_ms / 1000)
+        return f"bench://{dest_prefix}/{os.path.basename(local_path)}"
+
+    storage_supabase.client = lambda: None
+    storage_supabase.upload_file = fake_upload
+
+    if db == "fake":
+        ids = iter(range(1, 1 << 62))
+
+        def blocking(ret=None):
+            def call(*_a, **_k):
+                if db_ms:
+                    time.sleep(db_ms / 1000)
+                return ret() if ret else None
+            return call
+
+        orchestrator.init_db = lambda: None
+        orchestrator.start_run = blocking(lambda: next(ids))
+        orchestrator.finish_run = blocking()
+        orchestrator.add_metric = blocking()
+
+        async def _aflush():
+            pass
+        orchestrator.aflush = _aflush
+
+    t0 = time.perf_counter()
+    orch = orchestrator.Orchestrator(csv_path, concurrency=concurrency)
+    orch.load()
+    load_s = time.perf_counter() - t0
+    lags = []
+
+    async def lag_probe():
+        # how late a timer fires = how long something else held the loop
+        while True:
+            t = time.perf_counter()
+            await asyncio.sleep(lag_interval)
+            lags.append(time.perf_counter() - t - lag_interval)
+
+    async def drive():
+        probe = asyncio.create_task(lag_probe())
+        try:
+            await orch.run()
+        finally:
+            probe.cancel()
+
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    asyncio.run(drive())
+    wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    counts = orch.status_counts()
+    jobs = max(1, counts["done"] + counts["failed"])
+    # lower bound if the scheduler were free: the critical path or the width-limited total, whichever is longer
+    per_job = (job_ms + upload_ms + (2 * db_ms if db == "fake" else 0)) / 1000
+    ideal = max(orch.critical_path * per_job, jobs * per_job / concurrency)
+    ms = lambda v: round(v * 1000, 3)
+    return {
+        "concurrency": concurrency, "counts": counts, "load_s": round(load_s, 3), "wall_s": round(wall, 3),
+        "jobs_per_s": round(jobs / wall, 1),
+        "job_latency_ms": {"p50": ms(_pct(latencies, 0.5)), "p99": ms(_pct(latencies, 0.99))},
+        # CPU burned per job; the behavior and fakes only sleep, so this is the scheduler + ledger cost
+        "scheduler_cpu_us_per_job": round(cpu / jobs * 1e6, 1),
+        "efficiency_vs_ideal": round(ideal / wall, 3) if wall else None,
+        "loop_lag_ms": {"p50": ms(_pct(lags, 0.5)), "p99": ms(_pct(lags, 0.99)), "max": ms(max(lags, default=0))},
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def bench_dag(sizes, concurrencies, fan_in: int, depth: int, job_ms: float, upload_ms: float, db_ms: float,
+              db: str = "fake", seed: int = 0) -> dict:
+    """Synthetic-DAG sweep: one fresh interpreter per (size, concurrency) cell."""
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="qil-bench-") as tmp:
+        for n in sizes:
+            csv_path = os.path.join(tmp, f"plan_{n}.csv")
+            shape = synth_plan(csv_path, n, fan_in, depth, seed)
+            for c in concurrencies:
+                cell = os.path.join(tmp, f"run_{n}_{c}")
+                os.makedirs(cell)
+                env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])),
+                       "QIL_DB": os.path.join(cell, "qil.db"), "QIL_PLAN_CACHE": os.path.join(cell, ".qil_cache"),
+                       "QIL_DB_BACKEND": "sqlite", "QIL_ARTIFACT_INDEX": os.path.join(cell, "artifacts.jsonl")}
+                cmd = [sys.executable, "-m", "app.bench", "dag-once", csv_path, "--concurrency", str(c),
+                       "--job-ms", str(job_ms), "--upload-ms", str(upload_ms), "--db-ms", str(db_ms), "--db", db]
+                out = subprocess.run(cmd, cwd=cell, env=env, capture_output=True, text=True)
+                if out.returncode:
+                    raise RuntimeError(f"bench run n={n} c={c} failed:\n{out.stderr}")
+                result = json.loads(out.stdout.strip().splitlines()[-1])
+                runs.append({"plan": shape, **result})
+                print(f"n={n:>8} c={c:>5} {result['jobs_per_s']:>10} jobs/s  "
+                      f"p99 {result['job_latency_ms']['p99']} ms  lag p99 {result['loop_lag_ms']['p99']} ms  "
+                      f"rss {result['peak_rss_mb']} MB", file=sys.stderr)
+    return {
+        "bench": "dag",
+        "params": {"fan_in": fan_in, "depth": depth, "job_ms": job_ms, "upload_ms": upload_ms, "db_ms": db_ms,
+                   "db": db, "seed": seed},
+        "env": {"python": sys.version.split()[0], "cpus": os.cpu_count(), "commit": _git_commit(),
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+        "runs": runs,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="QIL orchestrator benchmarks")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--out", help="write results as JSON to this path")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    pp = sub.add_parser("process", help="CPU-bound behavior: async vs thread vs process mode",
+                        parents=[common])
+    pp.add_argument("--jobs", type=int, default=64)
+    pp.add_argument("--concurrency", type=int, default=32)
+    pp.add_argument("--rounds", type=int, default=200_000)
+    pp.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    pd = sub.add_parser("dag", help="scheduler hot path over synthetic DAG plans", parents=[common])
+    pd.add_argument("--nodes", type=int, nargs="+", default=[365, 10_000],
+                    help=f"plan sizes to sweep (e.g. {' '.join(map(str, DAG_SIZES))})")
+    pd.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    pd.add_argument("--fan-in", type=int, default=3, help="max dependencies per day")
+    pd.add_argument("--depth", type=int, default=50, help="number of layers (critical path length)")
+    pd.add_argument("--job-ms", type=float, default=1.0, help="simulated behavior time")
+    pd.add_argument("--upload-ms", type=float, default=5.0, help="simulated upload_file latency")
+    pd.add_argument("--db-ms", type=float, default=0.0, help="simulated blocking latency per ledger call (--db fake)")
+    pd.add_argument("--db", choices=("fake", "sqlite"), default="fake")
+    pd.add_argument("--seed", type=int, default=0)
+    po = sub.add_parser("dag-once", help=argparse.SUPPRESS)
+    po.add_argument("csv")
+    po.add_argument("--concurrency", type=int, default=16)
+    po.add_argument("--job-ms", type=float, default=1.0)
+    po.add_argument("--upload-ms", type=float, default=5.0)
+    po.add_argument("--db-ms", type=float, default=0.0)
+    po.add_argument("--db", choices=("fake", "sqlite"), default="fake")
+    args = p.parse_args(argv)
+
+    if args.cmd == "dag-once":
+        # child of `dag`: a single compact JSON line on stdout
+        print(json.dumps(bench_dag_once(args.csv, args.concurrency, args.job_ms, args.upload_ms, args.db_ms, args.db)))
+        return
+    if args.cmd == "process":
+        result = bench_process(args.jobs, args.concurrency, args.rounds, args.workers)
+    elif args.cmd == "dag":
+        result = bench_dag(args.nodes, args.concurrency, args.fan_in, args.depth, args.job_ms, args.upload_ms,
+                           args.db_ms, args.db, args.seed)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import json, time, asyncio
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
+
+INTERVAL = 0.25  # seconds between batches (and throughput ticks)
+HISTORY = 240  # batches kept for catch-up / Last-Event-ID resume (~1 min)
+MAX_LAG_BYTES = 1 << 20  # a subscriber further behind than this gets a snapshot instead
+
+
+def _sse(seq: int, kind: str, data: dict) -> bytes:
+    return f"id: {seq}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+class Broadcaster:
+    """Fans orchestrator events out to any number of SSE subscribers.
+
+    `publish` only appends to a list (and does nothing at all while nobody
+    is watching). Once per `interval` a single ticker task encodes what was
+    published, adds a `tick` event (ready queue, counts, throughput over
+    the interval) and stores the result as one shared batch of bytes, then
+    wakes the subscribers. A subscriber that is caught up sends that batch
+    as is; one that fell behind sends the batches it missed, or, when those
+    are gone or exceed `max_lag_bytes`, a single `snapshot` of the current
+    state. So the scheduler's cost does not depend on how many watch, and a
+    slow client never holds more than the shared history.
+    """
+
+    def __init__(self, interval: float = INTERVAL, history: int = HISTORY, max_lag_bytes: int = MAX_LAG_BYTES):
+        self.interval = interval
+        self.max_lag_bytes = max_lag_bytes
+        self.state: Callable[[], dict] = lambda: {}  # set by the orchestrator that is running
+        self.subscribers = 0
+        self._pending: list = []
+        self._batches: deque = deque(maxlen=history)  # (first seq, last seq, bytes)
+        self._seq = 0
+        self._tick = asyncio.Event()
+        self._ticker: Optional[asyncio.Task] = None
+        self._last_done: Optional[int] = None
+        self.stats = {"published": 0, "batches": 0, "snapshots": 0}
+
+    def publish(self, kind: str, **data):
+        if self.subscribers:
+            self._pending.append((kind, data))
+
+    def _flush(self):
+        state = self.state()
+        now = time.time()
+        done = state.get("done", 0) + state.get("failed", 0)
+        rate = 0.0 if self._last_done is None else max(0, done - self._last_done) / self.interval
+        self._last_done = done
+        pending, self._pending = self._pending, []
+        chunks = []
+        first = self._seq + 1
+        for kind, data in pending:
+            self._seq += 1
+            chunks.append(_sse(self._seq, kind, data))
+        self._seq += 1
+        chunks.append(_sse(self._seq, "tick", {"t": round(now, 3), "throughput": round(rate, 1), **state}))
+        self._batches.append((first, self._seq, b"".join(chunks)))
+        self.stats["published"] += len(pending)
+        self.stats["batches"] += 1
+        tick, self._tick = self._tick, asyncio.Event()
+        tick.set()
+
+    async def _run(self):
+        try:
+            while self.subscribers:
+                await asyncio.sleep(self.interval)
+                self._flush()
+        finally:
+            self._ticker = None
+            self._pending = []
+            self._last_done = None
+
+    def _snapshot(self) -> bytes:
+        self.stats["snapshots"] += 1
+        return _sse(self._seq, "snapshot", {"t": round(time.time(), 3), **self.state()})
+
+    def _since(self, cursor: int) -> Optional[bytes]:
+        # batches after `cursor`, or None when they are gone or too much to replay
+        if cursor > self._seq:
+            return None  # an id from before a restart
+        if not self._batches or cursor == self._seq:
+            return b""
+        if cursor < self._batches[0][0] - 1:
+            return None
+        out, size = [], 0
+        for first, last, data in reversed(self._batches):
+            if last <= cursor:
+                break
+            out.append(data)
+            size += len(data)
+            if size > self.max_lag_bytes:
+                return None
+        return b"".join(reversed(out))
+
+    async def stream(self, last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        self.subscribers += 1
+        if self._ticker is None:
+            self._ticker = asyncio.create_task(self._run())
+        try:
+            data = self._since(last_event_id) if last_event_id is not None else None
+            cursor = self._seq
+            yield data if data is not None else self._snapshot()
+            while True:
+                # every interval brings at least a tick, which doubles as the keep-alive
+                await self._tick.wait()
+                data = self._since(cursor)
+                if data is None:
+                    data = self._snapshot()
+                cursor = self._seq
+                if data:
+                    yield data
+        finally:
+            self.subscribers -= 1
+
+
+events = Broadcaster()
@@ -0,0 +1,105 @@
+import os, asyncio, inspect, importlib, importlib.util, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from types import MappingProxyType
+from typing import Callable, Optional
+
+PROCESS_WORKERS = int(os.environ.get("QIL_PROCESS_WORKERS", "0")) or os.cpu_count() or 1
+PROCESS_START = os.environ.get("QIL_PROCESS_START") or None  # fork / forkserver / spawn
+
+MODES = ("async", "thread", "process")
+
+# per-child state, set up once by the pool initializer
+_SHARED: dict = {}
+_LOADED: dict = {}
+
+
+def load_target(spec: str) -> Callable:
+    # "pkg.module:attr" or "/path/to/plugin.py:attr" (attr defaults to run)
+    target, _, attr = spec.partition(":")
+    if target.endswith(".py"):
+        name = "qil_plugin_" + os.path.splitext(os.path.basename(target))[0]
+        mod_spec = importlib.util.spec_from_file_location(name, target)
+        mod = importlib.util.module_from_spec(mod_spec)
+        mod_spec.loader.exec_module(mod)
+    else:
+        mod = importlib.import_module(target)
+    return getattr(mod, attr or "run")
+
+
+def _call(fn: Callable, vot: dict, ctx) -> dict:
+    out = fn(vot, ctx)
+    if inspect.isawaitable(out):
+        out = asyncio.run(out)
+    return out
+
+
+def _init_child(shared: dict):
+    _SHARED.clear()
+    _SHARED.update(shared)
+
+
+def _invoke(spec: str, vot: dict, ctx: dict) -> dict:
+    fn = _LOADED.get(spec)
+    if fn is None:
+        fn = _LOADED[spec] = load_target(spec)
+    return _call(fn, vot, MappingProxyType({**_SHARED, **ctx}))
+
+
+def _ping(_=None) -> int:
+    return os.getpid()
+
+
+class ProcessRunner:
+    """Pre-forked process pool for behaviors declaring `MODE = "process"`.
+
+    Behaviors are addressed by an import spec rather than pickled, the VOT
+    row and per-job ctx are plain dicts, and `shared` is installed once per
+    child and handed to every job as part of a read-only ctx.
+    """
+
+    def __init__(self, workers: int = PROCESS_WORKERS, start_method: Optional[str] = PROCESS_START):
+        self.workers = max(1, workers)
+        self.start_method = start_method
+        self.shared: dict = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self, shared: Optional[dict] = None):
+        if shared is not None and shared != self.shared:
+            self.shutdown()
+            self.shared = dict(shared)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_child, initargs=(self.shared,))
+            # fork every worker now instead of on the first jobs
+            list(self._pool.map(_ping, range(self.workers)))
+        return self
+
+    async def run(self, spec: str, vot: dict, ctx: dict) -> dict:
+        if self._pool is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, _invoke, spec, dict(vot), dict(ctx))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+process_runner = ProcessRunner()
+
+
+def as_coroutine(fn: Callable, mode: str, spec: str, runner: Optional[ProcessRunner] = None) -> Callable:
+    # wrap thread/process behaviors so callers always just `await run(vot, ctx)`
+    if mode == "thread":
+        async def run(vot, ctx):
+            return await asyncio.to_thread(_call, fn, vot, ctx)
+    elif mode == "process":
+        async def run(vot, ctx):
+            return await (runner or process_runner).run(spec, vot, ctx)
+    else:
+        return fn
+    run.__qualname__ = f"{mode}:{spec}"
+    return run
@@ -0,0 +1,180 @@
+import os, time, heapq, asyncio
+from collections import deque
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+# what a tenant is: "" (everyone shares one queue), "theme", "role" or any plan CSV column
+FAIR_KEY = os.environ.get("QIL_FAIR_KEY", "")
+# "Core Seed Ignition=1,Acme=4": relative share of workers while both have ready work
+WEIGHTS = os.environ.get("QIL_TENANT_WEIGHTS", "")
+# "Acme=8": at most this many of a tenant's jobs in flight
+CAPS = os.environ.get("QIL_TENANT_CAPS", "")
+WAIT_SAMPLES = 1024
+WINDOW = 1000
+
+
+def parse_map(spec: str, cast=float) -> Dict[str, float]:
+    out = {}
+    for part in spec.split(","):
+        name, sep, v = part.rpartition("=")
+        if sep and name.strip():
+            out[name.strip()] = cast(v)
+    return out
+
+
+class _Tenant:
+    __slots__ = ("name", "weight", "cap", "heap", "tag", "running", "dispatched", "waits", "queued_at")
+
+    def __init__(self, name: str, weight: float, cap: Optional[int]):
+        self.name, self.weight, self.cap = name, max(weight, 1e-6), cap
+        self.heap: list = []
+        self.tag = 0.0  # virtual time at which its next job would start
+        self.running = 0
+        self.dispatched = 0
+        self.waits: deque = deque(maxlen=WAIT_SAMPLES)
+        self.queued_at: Dict[int, float] = {}
+
+
+class FairQueue:
+    """Weighted fair queue of ready days, shaped like asyncio.PriorityQueue.
+
+    Each tenant (a theme, or a tenant column in the plan) keeps its own
+    priority heap, so critical-path order still holds within a tenant.
+    Across tenants, start-time fair queuing: every dispatch advances the
+    tenant's virtual tag by 1/weight and the backlogged tenant with the
+    smallest tag goes next, so a tenant with 100k ready days gets its
+    weighted share of workers and nothing more. A tenant that was idle
+    rejoins at the current virtual time instead of cashing in credit.
+    `cap` limits a tenant's jobs in flight; callers report finished jobs
+    through `release`.
+    """
+
+    def __init__(self, tenant_of: Callable[[int], Hashable], weights: Optional[Dict[str, float]] = None,
+                 caps: Optional[Dict[str, int]] = None, default_weight: float = 1.0):
+        self.tenant_of = tenant_of
+        self.weights = weights if weights is not None else parse_map(WEIGHTS)
+        self.caps = caps if caps is not None else parse_map(CAPS, int)
+        self.default_weight = default_weight
+        self.tenants: Dict[Hashable, _Tenant] = {}
+        self._eligible: list = []  # (tag, seq, tenant) — lazily invalidated
+        self._seq = 0
+        self._vtime = 0.0
+        self._size = 0
+        self._waiters: deque = deque()
+        self._recent: deque = deque(maxlen=WINDOW)
+
+    def _tenant(self, day: int) -> _Tenant:
+        name = self.tenant_of(day)
+        t = self.tenants.get(name)
+        if t is None:
+            key = str(name)
+            t = self.tenants[name] = _Tenant(key, self.weights.get(key, self.default_weight), self.caps.get(key))
+        return t
+
+    def _capped(self, t: _Tenant) -> bool:
+        return t.cap is not None and t.running >= t.cap
+
+    def _push(self, t: _Tenant):
+        self._seq += 1
+        heapq.heappush(self._eligible, (t.tag, self._seq, t))
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def put_nowait(self, item: Tuple[int, int]):
+        t = self._tenant(item[1])
+        if not t.heap:
+            # back from idle: no credit for the time it had nothing queued
+            t.tag = max(t.tag, self._vtime)
+            if not self._capped(t):
+                self._push(t)
+        heapq.heappush(t.heap, item)
+        t.queued_at[item[1]] = time.monotonic()
+        self._size += 1
+        self._wake()
+
+    def _pick(self) -> Optional[_Tenant]:
+        while self._eligible:
+            tag, _, t = self._eligible[0]
+            if not t.heap or self._capped(t) or tag != t.tag:
+                heapq.heappop(self._eligible)  # stale entry; capped tenants are re-pushed on release
+                continue
+            return t
+        return None
+
+    def get_nowait(self) -> Tuple[int, int]:
+        t = self._pick()
+        if t is None:
+            raise asyncio.QueueEmpty
+        heapq.heappop(self._eligible)
+        item = heapq.heappop(t.heap)
+        self._size -= 1
+        self._vtime = max(self._vtime, t.tag)
+        t.tag += 1.0 / t.weight
+        t.running += 1
+        t.dispatched += 1
+        queued = t.queued_at.pop(item[1], None)
+        if queued is not None:
+            t.waits.append(time.monotonic() - queued)
+        self._recent.append(t)
+        if t.heap and not self._capped(t):
+            self._push(t)
+        return item
+
+    async def get(self) -> Tuple[int, int]:
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+                elif fut.done() and not fut.cancelled():
+                    self._wake()  # pass the wake-up on
+                raise
+
+    def release(self, day: int):
+        # the job taken for `day` is over (ran, skipped or handed back); once per get
+        t = self._tenant(day)
+        was_capped = self._capped(t)
+        t.running -= 1
+        if was_capped and t.heap:
+            t.tag = max(t.tag, self._vtime)
+            self._push(t)
+            self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+
+    def report(self) -> dict:
+        # per tenant: queue wait percentiles and share of recent dispatches vs its weighted fair share
+        recent: Dict[_Tenant, int] = {}
+        for t in self._recent:
+            recent[t] = recent.get(t, 0) + 1
+        backlogged = [t for t in self.tenants.values() if t.heap]
+        total_w = sum(t.weight for t in backlogged) or 1.0
+        out = {}
+        for t in sorted(self.tenants.values(), key=lambda t: t.name):
+            waits = sorted(t.waits)
+            pct = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 2) if waits else None
+            out[t.name] = {
+                "weight": t.weight, "cap": t.cap, "queued": len(t.heap), "running": t.running,
+                "dispatched": t.dispatched, "wait_p50_ms": pct(0.5), "wait_p99_ms": pct(0.99),
+                "recent_share": round(recent.get(t, 0) / len(self._recent), 3) if self._recent else None,
+                "fair_share": round(t.weight / total_w, 3) if t.heap else None,
+            }
+        # Jain's index over weight-normalised recent service of the tenants still backlogged (1.0 = perfectly fair)
+        xs = [recent.get(t, 0) / t.weight for t in backlogged]
+        jain = round(sum(xs) ** 2 / (len(xs) * sum(x * x for x in xs)), 3) if xs and any(xs) else None
+        return {"tenants": out, "jain_index": jain}
@@ -1,8 +1,48 @@
-import os
+import asyncio
 
-backend = os.environ.get("QIL_DB_BACKEND", "sqlite").lower()
+from .services import services
+from .tsdb import store as metric_store
 
-if backend == "supabase":
-    from .db_supabase import init_db, start_run, finish_run, add_metric  # type: ignore
-else:
-    from .db import init_db, start_run, finish_run, add_metric  # type: ignore
+def ledger():
+    # app.infra.db or app.infra.db_supabase (QIL_DB_BACKEND), imported on first use
+    return services.get("ledger")
+
+
+def init_db():
+    return ledger().init_db()
+
+
+async def wait_room():
+    # await before queueing a job's rows so a full write buffer slows producers, not the event loop
+    await ledger().wait_room()
+
+
+def start_run(day: int, fingerprint=None):
+    return ledger().start_run(day, fingerprint)
+
+
+def finish_run(run_id, ok: bool, artifacts: dict = {}):
+    ledger().finish_run(run_id, ok, artifacts)
+
+
+def completed_runs():
+    return ledger().completed_runs()
+
+
+def add_metric(day: int, k: str, v: float):
+    # the ledger row is the record; the time-series store adds windowed queries on top
+    ledger().add_metric(day, k, v)
+    metric_store.add(k, v, day)
+
+
+def flush():
+    # nothing to flush in a ledger that was never used
+    ok = ledger().flush() if services.ready("ledger") else True
+    metric_store.save()
+    return ok
+
+
+async def aflush():
+    ok = await ledger().aflush() if services.ready("ledger") else True
+    await asyncio.to_thread(metric_store.save)
+    return ok
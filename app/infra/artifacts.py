@@ -0,0 +1,292 @@
+import os, json, mmap, asyncio, hashlib, threading
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Union
+
+ART_DIR = os.environ.get("QIL_ART_DIR", "artifacts")
+PACK_MODE = os.environ.get("QIL_ARTIFACT_PACKS", "").lower() in ("1", "true", "yes")
+PACK_DIR = os.environ.get("QIL_PACK_DIR", os.path.join(ART_DIR, "packs"))
+PACK_BYTES = int(os.environ.get("QIL_PACK_BYTES", str(64 << 20)))
+PACK_PREFIX = "packs"
+REF_SCHEME = "qilpack://"
+
+# "hedge" while a hedged second attempt runs (app/worker.py); its artifacts get their own names so the
+# two attempts never write the same file
+attempt: ContextVar[str] = ContextVar("qil_attempt", default="")
+
+
+def attempt_path(path: str) -> str:
+    # day001_x.txt -> day001_x.hedge.txt inside a hedged attempt
+    tag = attempt.get()
+    if not tag:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{tag}{ext}"
+
+
+def make_ref(pack: str, offset: int, length: int) -> str:
+    # qilpack://000003.pack#bytes=1024-2047 (inclusive, like an HTTP Range)
+    return f"{REF_SCHEME}{pack}#bytes={offset}-{offset + length - 1}"
+
+
+def parse_ref(ref: str):
+    pack, _, rng = ref[len(REF_SCHEME):].partition("#bytes=")
+    start, _, end = rng.partition("-")
+    return pack, int(start), int(end) - int(start) + 1
+
+
+class PackStore:
+    """Artifacts appended into size-rotated pack files.
+
+    `<root>/<seq>.pack` holds the raw bytes back to back; `index.jsonl` maps
+    each artifact name to (pack, offset, length, sha256) and `packs.jsonl`
+    records sealed packs with their uploaded URL. Identical content is
+    stored once. A pack is sealed when the next artifact would push it past
+    `pack_bytes`, and only sealed packs are uploaded, as one object each.
+    On startup the active pack is cut back to the end of its last indexed
+    artifact, dropping anything a crash left half-written.
+    """
+
+    def __init__(self, root: str = PACK_DIR, pack_bytes: int = PACK_BYTES):
+        self.root = root
+        self.pack_bytes = max(1, pack_bytes)
+        self._lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}  # name -> latest entry
+        self._by_sha: Dict[str, dict] = {}
+        self.sealed: Dict[str, Optional[str]] = {}  # pack -> url (None until uploaded)
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._unsent: List[str] = []
+        self._active: Optional[str] = None
+        self._f = None
+        self._size = 0
+        self._index_f = None
+        self.stats = {"artifacts": 0, "dedup_hits": 0, "bytes": 0, "packs_sealed": 0}
+        os.makedirs(root, exist_ok=True)
+        self._recover()
+
+    def _path(self, pack: str) -> str:
+        return os.path.join(self.root, pack)
+
+    def _recover(self):
+        packs_log = os.path.join(self.root, "packs.jsonl")
+        if os.path.exists(packs_log):
+            with open(packs_log, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue
+                    if self.sealed.get(e["pack"]) is None:
+                        self.sealed[e["pack"]] = e.get("url")
+        sizes = {}
+        index = os.path.join(self.root, "index.jsonl")
+        if os.path.exists(index):
+            with open(index, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue
+                    pack = e["pack"]
+                    if pack not in sizes:
+                        p = self._path(pack)
+                        sizes[pack] = os.path.getsize(p) if os.path.exists(p) else 0
+                    if e["offset"] + e["length"] > sizes[pack]:
+                        continue  # index line outlived its bytes
+                    self.entries[e["name"]] = e
+                    self._by_sha.setdefault(e["sha256"], e)
+        self._unsent = [p for p, url in sorted(self.sealed.items()) if url is None]
+        seqs = sorted(int(n.split(".")[0]) for n in os.listdir(self.root) if n.endswith(".pack"))
+        last = f"{seqs[-1]:06d}.pack" if seqs else None
+        if last and last not in self.sealed:
+            end = max((e["offset"] + e["length"] for e in self.entries.values() if e["pack"] == last), default=0)
+            with open(self._path(last), "r+b") as f:
+                f.truncate(end)
+            self._open(last, end)
+        else:
+            self._open(f"{(seqs[-1] if seqs else 0) + 1:06d}.pack", 0)
+        self._index_f = open(index, "a", encoding="utf-8")
+
+    def _open(self, pack: str, size: int):
+        self._active, self._size = pack, size
+        self._f = open(self._path(pack), "ab")
+
+    def append(self, name: str, data: bytes, content_type: Optional[str] = None) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            hit = self._by_sha.get(digest)
+            if hit is not None:
+                e = {**hit, "name": name}
+                self.stats["dedup_hits"] += 1
+            else:
+                if self._size and self._size + len(data) > self.pack_bytes:
+                    self._seal()
+                e = {"name": name, "pack": self._active, "offset": self._size, "length": len(data),
+                     "sha256": digest, "content_type": content_type}
+                self._f.write(data)
+                self._size += len(data)
+                self._by_sha[digest] = e
+                self.stats["bytes"] += len(data)
+            self.entries[name] = e
+            self._index_f.write(json.dumps(e) + "\n")
+            self.stats["artifacts"] += 1
+        return make_ref(e["pack"], e["offset"], e["length"])
+
+    def _seal(self):
+        # caller holds the lock
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+        self._index_f.flush()
+        pack = self._active
+        self.sealed[pack] = None
+        self._unsent.append(pack)
+        self._log_pack(pack, None)
+        self.stats["packs_sealed"] += 1
+        self._open(f"{int(pack.split('.')[0]) + 1:06d}.pack", 0)
+
+    def seal(self):
+        # close the active pack early (shutdown, end of a plan)
+        with self._lock:
+            if self._size:
+                self._seal()
+            else:
+                self._index_f.flush()
+
+    def take_unsent(self) -> List[str]:
+        with self._lock:
+            unsent, self._unsent = self._unsent, []
+        return unsent
+
+    def mark_uploaded(self, pack: str, url: Optional[str]):
+        with self._lock:
+            self.sealed[pack] = url
+            if url is None:
+                self._unsent.append(pack)  # retry with the next batch
+            else:
+                self._log_pack(pack, url)
+
+    def _log_pack(self, pack: str, url: Optional[str]):
+        with open(os.path.join(self.root, "packs.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"pack": pack, "url": url}) + "\n")
+
+    def lookup(self, ref_or_name: str) -> dict:
+        if ref_or_name.startswith(REF_SCHEME):
+            pack, offset, length = parse_ref(ref_or_name)
+            return {"pack": pack, "offset": offset, "length": length}
+        e = self.entries.get(ref_or_name)
+        if e is None:
+            raise KeyError(ref_or_name)
+        return e
+
+    def resolve(self, ref_or_name: str) -> dict:
+        # -> where to fetch it: the pack's URL (once uploaded) plus an HTTP byte range
+        e = self.lookup(ref_or_name)
+        start, end = e["offset"], e["offset"] + e["length"] - 1
+        return {"ref": make_ref(e["pack"], e["offset"], e["length"]), "pack": e["pack"],
+                "url": self.sealed.get(e["pack"]), "range": f"bytes={start}-{end}",
+                "offset": e["offset"], "length": e["length"], "local_path": self._path(e["pack"])}
+
+    def read(self, ref_or_name: str) -> bytes:
+        e = self.lookup(ref_or_name)
+        pack, offset, length = e["pack"], e["offset"], e["length"]
+        if pack == self._active:
+            # still growing: map what's on disk now, just for this read
+            with self._lock:
+                self._f.flush()
+            with open(self._path(pack), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return m[offset:offset + length]
+        m = self._maps.get(pack)
+        if m is None:
+            with open(self._path(pack), "rb") as f:
+                m = self._maps.setdefault(pack, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return m[offset:offset + length]
+
+    def close(self):
+        self.seal()
+        with self._lock:
+            self._f.close()
+            self._index_f.close()
+            for m in self._maps.values():
+                m.close()
+            self._maps.clear()
+
+
+_store: Optional[PackStore] = None
+_uploads: set = set()
+
+
+def packs() -> PackStore:
+    global _store
+    if _store is None:
+        _store = PackStore()
+    return _store
+
+
+def _upload_sealed():
+    from .uploads import submit
+    store = packs()
+
+    async def send(pack: str):
+        try:
+            url = await (await submit(os.path.join(store.root, pack), PACK_PREFIX))
+        except Exception as e:
+            print(f"⚠️ Pack {pack} upload failed: {e}")
+            url = None
+        store.mark_uploaded(pack, url)
+
+    for pack in store.take_unsent():
+        t = asyncio.ensure_future(send(pack))
+        _uploads.add(t)
+        t.add_done_callback(_uploads.discard)
+
+
+async def save(path: str, data: Union[str, bytes], content_type: Optional[str] = None) -> Optional[str]:
+    """Store one artifact and return where it lives.
+
+    Default mode writes `path` and uploads it as its own object (-> URL).
+    With `QIL_ARTIFACT_PACKS=1` the bytes are appended to the current pack
+    instead (-> a `qilpack://` ref; see `resolve` and `read`), and packs are
+    uploaded whole as they fill up. A hedged attempt stores under its own
+    name (`attempt_path`).
+    """
+    path = attempt_path(path)
+    if not PACK_MODE:
+        import aiofiles
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        async with aiofiles.open(path, "wb" if isinstance(data, bytes) else "w") as f:
+            await f.write(data)
+        from .uploads import upload
+        return await upload(path)
+    raw = data.encode("utf-8") if isinstance(data, str) else data
+    store = packs() if _store is not None else await asyncio.to_thread(packs)
+    # hashing, the write and a seal's fsync stay off the event loop
+    ref = await asyncio.to_thread(store.append, os.path.basename(path), raw, content_type)
+    if store._unsent:
+        _upload_sealed()
+    return ref
+
+
+async def aflush():
+    # seal the active pack, then wait until every sealed pack and every artifact upload still in flight is done
+    if _store is not None:
+        await asyncio.to_thread(_store.seal)
+        _upload_sealed()
+        while _uploads:
+            await asyncio.gather(*list(_uploads), return_exceptions=True)
+    from .uploads import uploader
+    await uploader.drain()
+
+
+def resolve(ref_or_name: str) -> dict:
+    return packs().resolve(ref_or_name)
+
+
+def read(ref_or_name: str) -> bytes:
+    return packs().read(ref_or_name)
+
+
+def pack_stats() -> dict:
+    if _store is None:
+        return {}
+    return {**_store.stats, "sealed": len(_store.sealed),
+            "uploaded": sum(1 for url in _store.sealed.values() if url)}
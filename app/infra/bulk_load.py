@@ -0,0 +1,198 @@
+import os, json, time, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.models.plan import Plan, ROLE_SEP, load_plan
+
+SNAPSHOT_PATH = os.environ.get("QIL_LOAD_SNAPSHOT", os.path.join(".qil_cache", "supabase_load.json"))
+BATCH = int(os.environ.get("QIL_LOAD_BATCH", "500"))
+INFLIGHT = int(os.environ.get("QIL_LOAD_INFLIGHT", "4"))
+PAGE = 1000  # PostgREST's default max rows per select
+DIFF_MODES = ("auto", "snapshot", "table", "none")
+
+
+class Table:
+    # key columns identify a row; the rest are compared to detect changes
+    def __init__(self, name: str, key: Tuple[str, ...], columns: Tuple[str, ...]):
+        self.name, self.key, self.columns = name, key, columns
+
+    def key_of(self, row: dict) -> str:
+        return ",".join(str(row[k]) for k in self.key)
+
+    def digest(self, row: dict) -> str:
+        return hashlib.sha1(json.dumps([row[c] for c in self.columns]).encode("utf-8")).hexdigest()[:16]
+
+    def upsert_args(self) -> dict:
+        # key-only tables (edges) have nothing to update, so conflicts are simply skipped
+        return {"on_conflict": ",".join(self.key), "ignore_duplicates": self.columns == self.key}
+
+
+VOT = Table("vot", ("day",), ("day", "role", "theme"))
+EDGE = Table("edge", ("src", "dst"), ("src", "dst"))
+TABLES = {t.name: t for t in (VOT, EDGE)}
+
+
+def plan_rows(plan: Plan) -> Dict[str, Dict[str, dict]]:
+    # table -> key -> row, straight from the columnar plan (one CSV parse for both tables)
+    vot, edge = {}, {}
+    for i in range(len(plan)):
+        day = plan.day[i]
+        row = {"day": day, "role": plan.name[i].split(ROLE_SEP)[0].strip(), "theme": plan.theme[i]}
+        vot[VOT.key_of(row)] = row
+        for d in plan.deps(i):  # parse_deps already dropped duplicate and self edges
+            e = {"src": d, "dst": day}
+            edge[EDGE.key_of(e)] = e
+    return {"vot": vot, "edge": edge}
+
+
+class BulkLoader:
+    """Diff-based loader for the plan tables in Supabase.
+
+    The current state comes from a local snapshot of the last successful
+    load (per project URL) or, failing that, from paging through the table.
+    Only inserted, changed and deleted rows are sent, in batches of
+    `batch`, with up to `inflight` requests running at once. The snapshot
+    is rewritten only when every batch of a table went through.
+    """
+
+    def __init__(self, client, project: str = "", snapshot_path: Optional[str] = SNAPSHOT_PATH,
+                 batch: int = BATCH, inflight: int = INFLIGHT, retries: int = 3):
+        self.client = client
+        self.project = project
+        self.snapshot_path = snapshot_path
+        self.batch = max(1, batch)
+        self.inflight = max(1, inflight)
+        self.retries = retries
+        self.summary: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _read_snapshot(self) -> dict:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return {}
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                return json.load(f).get(self.project, {})
+        except (OSError, ValueError):
+            return {}
+
+    def _write_snapshot(self, table: str, state: Dict[str, str]):
+        if not self.snapshot_path:
+            return
+        data = {}
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        data.setdefault(self.project, {})[table] = state
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        tmp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.snapshot_path)
+
+    def _page(self, t: Table, start: int) -> List[dict]:
+        q = self.client.table(t.name).select(",".join(t.columns))
+        # order by the whole key: rows tied on a prefix (edges sharing a src) could otherwise
+        # come back in a different order per page and be skipped or repeated
+        for c in t.key:
+            q = q.order(c)
+        return q.range(start, start + PAGE - 1).execute().data
+
+    def _fetch(self, t: Table, stats: dict) -> Dict[str, str]:
+        state, start = {}, 0
+        while True:
+            rows = self._call(lambda: self._page(t, start), stats)
+            for r in rows:
+                state[t.key_of(r)] = t.digest(r)
+            if len(rows) < PAGE:
+                return state
+            start += PAGE
+
+    def _call(self, fn, stats: dict):
+        for attempt in range(self.retries + 1):
+            try:
+                with self._lock:
+                    stats["requests"] += 1
+                return fn()
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(0.5 * (2 ** attempt))
+
+    def _delete(self, t: Table, keys: List[str]):
+        q = self.client.table(t.name).delete()
+        if len(t.key) == 1:
+            return q.in_(t.key[0], [int(k) if k.lstrip("-").isdigit() else k for k in keys]).execute()
+        clauses = []
+        for k in keys:
+            parts = ",".join(f"{c}.eq.{v}" for c, v in zip(t.key, k.split(",")))
+            clauses.append(f"and({parts})")
+        return q.or_(",".join(clauses)).execute()
+
+    def load(self, rows: Dict[str, Dict[str, dict]], diff: str = "auto",
+             tables: Iterable[str] = ("vot", "edge")) -> Dict[str, dict]:
+        if diff not in DIFF_MODES:
+            raise ValueError(f"diff must be one of {DIFF_MODES}, got {diff!r}")
+        snapshot = self._read_snapshot() if diff in ("auto", "snapshot") else {}
+        with ThreadPoolExecutor(max_workers=self.inflight, thread_name_prefix="qil-load") as pool:
+            for name in tables:
+                self.summary[name] = self._load_table(TABLES[name], rows[name], diff, snapshot, pool)
+        return self.summary
+
+    def _load_table(self, t: Table, desired: Dict[str, dict], diff: str, snapshot: dict, pool) -> dict:
+        t0 = time.perf_counter()
+        stats = {"rows": len(desired), "inserted": 0, "changed": 0, "deleted": 0, "unchanged": 0,
+                 "requests": 0, "source": diff}
+        if diff == "none":
+            current = {}
+        elif t.name in snapshot:
+            current, stats["source"] = snapshot[t.name], "snapshot"
+        elif diff == "snapshot":
+            current = {}  # no snapshot yet: everything counts as new
+        else:
+            current, stats["source"] = self._fetch(t, stats), "table"
+
+        want = {k: t.digest(r) for k, r in desired.items()}
+        upserts = []
+        for k, h in want.items():
+            old = current.get(k)
+            if old == h:
+                stats["unchanged"] += 1
+                continue
+            stats["inserted" if old is None else "changed"] += 1
+            upserts.append(desired[k])
+        deletes = [k for k in current if k not in want] if diff != "none" else []
+        stats["deleted"] = len(deletes)
+
+        args = t.upsert_args()
+        jobs = [pool.submit(self._call, lambda b=upserts[i:i + self.batch]:
+                            self.client.table(t.name).upsert(b, **args).execute(), stats)
+                for i in range(0, len(upserts), self.batch)]
+        jobs += [pool.submit(self._call, lambda b=deletes[i:i + self.batch]: self._delete(t, b), stats)
+                 for i in range(0, len(deletes), self.batch)]
+        failed = 0
+        for j in jobs:
+            try:
+                j.result()
+            except Exception as e:
+                failed += 1
+                print(f"[warn] {t.name}: batch failed: {e}")
+        stats["failed_batches"] = failed
+        if not failed:
+            self._write_snapshot(t.name, want)
+        stats["seconds"] = round(time.perf_counter() - t0, 3)
+        return stats
+
+
+def load_csv(client, csv_path: str, project: str = "", diff: str = "auto", tables: Iterable[str] = ("vot", "edge"),
+             **kw) -> Dict[str, dict]:
+    return BulkLoader(client, project, **kw).load(plan_rows(load_plan(csv_path)), diff, tables)
+
+
+def print_summary(summary: Dict[str, dict]):
+    for name, s in summary.items():
+        print(f"[ok] {name}: {s['rows']} rows (+{s['inserted']} ~{s['changed']} -{s['deleted']}, "
+              f"{s['unchanged']} unchanged; diff vs {s['source']}) in {s['requests']} requests, {s['seconds']}s"
+              + (f", {s['failed_batches']} failed batches" if s["failed_batches"] else ""))
@@ -1,45 +1,294 @@
-import sqlite3, json, os, datetime
-from typing import Dict, Any
+import sqlite3, json, os, time, datetime, threading, queue, atexit, asyncio
+from typing import Dict, Any, Optional
+
+from . import metrics
 
 DB_PATH = os.environ.get("QIL_DB", "qil.db")
+BATCH_MAX = int(os.environ.get("QIL_DB_BATCH", "512"))
+WRITE_RETRIES = int(os.environ.get("QIL_DB_RETRIES", "3"))
+ID_BLOCK = int(os.environ.get("QIL_DB_ID_BLOCK", "256"))
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS run (id INTEGER PRIMARY KEY AUTOINCREMENT, day INTEGER, ok INTEGER, started_at TEXT, finished_at TEXT, artifacts TEXT, fingerprint TEXT)",
+    "CREATE TABLE IF NOT EXISTS metric (id INTEGER PRIMARY KEY AUTOINCREMENT, day INTEGER, k TEXT, v REAL, ts TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_run_day ON run(day)",
+    "CREATE INDEX IF NOT EXISTS idx_metric_day_k ON metric(day, k)",
+    # high-water mark of run ids handed out in blocks to ledger processes
+    "CREATE TABLE IF NOT EXISTS run_id_seq (k INTEGER PRIMARY KEY, last INTEGER NOT NULL)",
+]
+
+INSERT_RUN = "INSERT INTO run(id, day, ok, started_at, finished_at, artifacts, fingerprint) VALUES(?,?,?,?,?,?,?)"
+FINISH_RUN = "UPDATE run SET ok=?, finished_at=?, artifacts=? WHERE id=?"
+INSERT_METRIC = "INSERT INTO metric(day, k, v, ts) VALUES(?,?,?,?)"
+_BARRIER, _STOP, _RESERVE = object(), object(), object()
 
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
     conn.row_factory = sqlite3.Row
     return conn
 
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat()
+
+
+class Ledger:
+    """Single-writer SQLite ledger.
+
+    One long-lived WAL connection lives on a dedicated thread. Callers only
+    enqueue statements; the writer drains whatever has piled up, runs runs of
+    identical statements through `executemany` and commits once per batch.
+    A batch that hits a bad row is replayed row by row so only that row is
+    lost; `flush` reports dropped rows by returning False.
+    Run ids come from blocks reserved in `run_id_seq`, so several processes
+    can share one ledger; the writer thread reserves the next block while
+    half of the current one is still left, so `start_run` never touches
+    the disk itself.
+    """
+
+    def __init__(self, path: str = DB_PATH, batch_max: int = BATCH_MAX):
+        self.path = path
+        self.batch_max = max(1, batch_max)
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._ids = None
+        self._id_lock = threading.Condition()
+        self._left = 0  # ids left in the current block
+        self._spare = None  # the next block, reserved ahead by the writer
+        self._reserving = False
+        self._reserve_error: Optional[BaseException] = None
+        self.failed_rows = 0
+        self._unreported = 0  # failed since the last flush
+        self._commit_seconds = metrics.LEDGER_COMMIT.labels()
+        self._batch_rows = metrics.LEDGER_BATCH.labels()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._ready.clear()
+                self._error = None
+                self._thread = threading.Thread(target=self._loop, name="qil-ledger", daemon=True)
+                self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for stmt in SCHEMA:
+            conn.execute(stmt)
+        # ledgers created before plan fingerprints existed
+        if "fingerprint" not in {r[1] for r in conn.execute("PRAGMA table_info(run)")}:
+            conn.execute("ALTER TABLE run ADD COLUMN fingerprint TEXT")
+        conn.commit()
+        with self._id_lock:
+            self._ids, self._left = iter(()), 0
+            self._spare, self._reserving, self._reserve_error = self._reserve_ids(), False, None
+        return conn
+
+    def _reserve_ids(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR IGNORE INTO run_id_seq(k, last) SELECT 0, COALESCE(MAX(id), 0) FROM run")
+            last = conn.execute("SELECT last FROM run_id_seq WHERE k=0").fetchone()[0]
+            conn.execute("UPDATE run_id_seq SET last=? WHERE k=0", (last + ID_BLOCK,))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return iter(range(last + 1, last + ID_BLOCK + 1))
+
+    def _next_id(self) -> int:
+        with self._id_lock:
+            while True:
+                rid = next(self._ids, None)
+                if rid is not None:
+                    self._left -= 1
+                    if self._left <= ID_BLOCK // 2:
+                        self._ask_reserve()
+                    return rid
+                if self._spare is not None:
+                    self._ids, self._spare, self._left = self._spare, None, ID_BLOCK
+                    continue
+                if self._reserve_error is not None:
+                    e, self._reserve_error = self._reserve_error, None
+                    raise e
+                # ran through a whole block before the writer got to the next one
+                self._ask_reserve()
+                self._id_lock.wait()
+
+    def _ask_reserve(self):
+        # caller holds self._id_lock
+        if self._spare is None and not self._reserving:
+            self._reserving = True
+            self._q.put((_RESERVE, None))
+
+    def _reserve_ahead(self):
+        # on the writer thread
+        try:
+            block, error = self._reserve_ids(), None
+        except Exception as e:
+            block, error = None, e
+            print(f"⚠️ Ledger could not reserve run ids: {e}")
+        with self._id_lock:
+            self._spare, self._reserve_error, self._reserving = block, error, False
+            self._id_lock.notify_all()
+
+    def _loop(self):
+        try:
+            conn = self._open()
+        except BaseException as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        stop = False
+        while not stop:
+            batch = [self._q.get()]
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: list) -> bool:
+        groups, waiters, stop, reserve = [], [], False, False
+        for sql, params in batch:
+            if sql is _RESERVE:
+                reserve = True
+            elif sql is _BARRIER or sql is _STOP:
+                waiters.append(params)
+                stop = stop or sql is _STOP
+            elif groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        t0 = time.perf_counter()
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                for sql, rows in groups:
+                    conn.executemany(sql, rows)
+                conn.commit()
+                break
+            except sqlite3.OperationalError as e:
+                # locked / I/O trouble: the whole batch is fine, try it again a little later
+                conn.rollback()
+                if attempt == WRITE_RETRIES:
+                    self._failed(sum(len(rows) for _, rows in groups), e)
+                else:
+                    time.sleep(0.1 * (2 ** attempt))
+            except Exception:
+                # a bad row: commit the others one by one rather than losing the whole group
+                conn.rollback()
+                self._write_rows(conn, groups)
+                break
+        if groups:
+            self._commit_seconds.observe(time.perf_counter() - t0)
+            self._batch_rows.observe(len(batch) - len(waiters) - reserve)
+        if reserve:
+            self._reserve_ahead()
+        for ev in waiters:
+            ev.set()
+        return stop
+
+    def _write_rows(self, conn: sqlite3.Connection, groups: list):
+        for sql, rows in groups:
+            for params in rows:
+                try:
+                    conn.execute(sql, params)
+                except Exception as e:
+                    self._failed(1, e)
+        try:
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._failed(sum(len(rows) for _, rows in groups), e)
+
+    def _failed(self, rows: int, e: BaseException):
+        print(f"⚠️ Ledger dropped {rows} row(s): {e}")
+        with self._lock:
+            self.failed_rows += rows
+            self._unreported += rows
+
+    def _put(self, sql: str, params: tuple):
+        if self._ids is None:
+            self.start()
+        self._q.put((sql, params))
+
+    def start_run(self, day: int, fingerprint: Optional[str] = None) -> int:
+        if self._ids is None:
+            self.start()
+        rid = self._next_id()
+        self._put(INSERT_RUN, (rid, day, None, _now(), None, "{}", fingerprint))
+        return rid
+
+    def finish_run(self, run_id: int, ok: bool, artifacts: Dict[str, Any]):
+        self._put(FINISH_RUN, (1 if ok else 0, _now(), json.dumps(artifacts), run_id))
+
+    def add_metric(self, day: int, k: str, v: float):
+        self._put(INSERT_METRIC, (day, k, v, _now()))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # blocks until everything enqueued so far is committed; False if that timed out
+        # or rows were dropped since the previous flush
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        ev = threading.Event()
+        self._q.put((_BARRIER, ev))
+        done = ev.wait(timeout)
+        with self._lock:
+            failed, self._unreported = self._unreported, 0
+        return done and not failed
+
+    def close(self):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        ev = threading.Event()
+        self._q.put((_STOP, ev))
+        ev.wait()
+        self._thread.join()
+        self._ids = None
+
+
+ledger = Ledger()
+atexit.register(ledger.close)
+
 def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS run (id INTEGER PRIMARY KEY AUTOINCREMENT, day INTEGER, ok INTEGER, started_at TEXT, finished_at TEXT, artifacts TEXT)")
-    cur.execute("CREATE TABLE IF NOT EXISTS metric (id INTEGER PRIMARY KEY AUTOINCREMENT, day INTEGER, k TEXT, v REAL, ts TEXT)")
-    conn.commit()
-    conn.close()
+    ledger.start()
 
-def start_run(day: int) -> int:
-    conn = get_conn()
-    cur = conn.cursor()
-    now = datetime.datetime.utcnow().isoformat()
-    cur.execute("INSERT INTO run(day, ok, started_at, finished_at, artifacts) VALUES(?,?,?,?,?)",
-                (day, None, now, None, "{}"))
-    rid = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return rid
+def start_run(day: int, fingerprint: Optional[str] = None) -> int:
+    return ledger.start_run(day, fingerprint)
 
 def finish_run(run_id: int, ok: bool, artifacts: Dict[str, Any] = {}):
-    conn = get_conn()
-    cur = conn.cursor()
-    now = datetime.datetime.utcnow().isoformat()
-    cur.execute("UPDATE run SET ok=?, finished_at=?, artifacts=? WHERE id=?",
-                (1 if ok else 0, now, json.dumps(artifacts), run_id))
-    conn.commit()
-    conn.close()
+    ledger.finish_run(run_id, ok, artifacts)
 
 def add_metric(day: int, k: str, v: float):
+    ledger.add_metric(day, k, v)
+
+def completed_runs() -> Dict[int, Optional[str]]:
+    # day -> plan fingerprint of its most recent successful run
+    ledger.start()
+    ledger.flush()
     conn = get_conn()
-    cur = conn.cursor()
-    now = datetime.datetime.utcnow().isoformat()
-    cur.execute("INSERT INTO metric(day, k, v, ts) VALUES(?,?,?,?)", (day, k, v, now))
-    conn.commit()
-    conn.close()
+    try:
+        rows = conn.execute("SELECT day, fingerprint FROM run WHERE ok=1 ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    return {r["day"]: r["fingerprint"] for r in rows}
+
+def flush():
+    return ledger.flush()
+
+async def aflush():
+    return await asyncio.to_thread(ledger.flush)
+
+async def wait_room():
+    # the writer queue is unbounded; nothing to wait for
+    return
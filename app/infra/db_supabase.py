@@ -1,51 +1,213 @@
-import os, json, datetime
-from typing import Dict, Any, Optional
+import os, json, datetime, uuid, time, threading, atexit, asyncio, itertools
+from typing import Dict, Any, Optional, List, Callable
 
-try:
-    from supabase import create_client, Client  # supabase-py v2
-except Exception as e:
-    create_client = None
-    Client = None
+from .services import supabase_client
 
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+BATCH_SIZE = int(os.environ.get("QIL_SB_BATCH", "500"))
+FLUSH_INTERVAL = float(os.environ.get("QIL_SB_FLUSH_INTERVAL", "1.0"))
+MAX_BUFFER = int(os.environ.get("QIL_SB_MAX_BUFFER", "5000"))
+RETRIES = int(os.environ.get("QIL_SB_RETRIES", "3"))
 
-_client: Optional["Client"] = None
 
 def client():
-    global _client
-    if _client is None:
-        if not SUPABASE_URL or not SUPABASE_KEY:
-            raise RuntimeError("Supabase env vars missing")
-        if create_client is None:
-            raise RuntimeError("supabase-py not installed. Add `supabase>=2` to requirements.")
-        _client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    return _client
+    # the process-wide client, created (and supabase-py imported) on first use
+    return supabase_client()
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat()
+
+def _on_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class BufferedWriter:
+    """Accumulates run/metric rows and ships them as bulk PostgREST calls.
+
+    A background thread flushes when `batch_size` rows are buffered or every
+    `interval` seconds. Run ids are uuids minted locally, so a run's start
+    and finish usually collapse into one upserted row; finishing a run
+    started elsewhere is buffered too, as a partial upsert. Producers block
+    once `max_buffer` rows are waiting; code on the event loop awaits
+    `wait_room` instead, which waits in a thread, and is never blocked by
+    the sync calls. Metrics keep their arrival order.
+    """
+
+    def __init__(self, client_factory: Callable = client, batch_size: int = BATCH_SIZE,
+                 interval: float = FLUSH_INTERVAL, max_buffer: int = MAX_BUFFER, retries: int = RETRIES):
+        self._client_factory = client_factory
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.max_buffer = max(self.batch_size, max_buffer)
+        self.retries = max(0, retries)
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._runs: Dict[str, dict] = {}
+        self._metrics: List[dict] = []
+        self._finishes: Dict[str, dict] = {}  # finished here, started by another process
+        self._open: Dict[str, dict] = {}  # started, not finished yet
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {"rows": 0, "requests": 0, "dropped": 0}
+        self._unreported = 0  # dropped since the last flush
+
+    def _size(self) -> int:
+        return len(self._runs) + len(self._metrics) + len(self._finishes)
+
+    def _admit(self):
+        # caller holds self._cond
+        if self._thread is None or not self._thread.is_alive():
+            self._closed = False
+            self._thread = threading.Thread(target=self._loop, name="qil-sb-writer", daemon=True)
+            self._thread.start()
+        if _on_loop():
+            return  # never block the event loop; async producers wait in `wait_room`
+        while self._size() >= self.max_buffer:
+            self._cond.notify_all()
+            self._cond.wait()
+
+    def _wait_room(self):
+        with self._cond:
+            while self._size() >= self.max_buffer:
+                self._cond.notify_all()
+                self._cond.wait()
+
+    async def wait_room(self):
+        # backpressure for producers on the event loop: only the awaiting task waits
+        if self._size() >= self.max_buffer:
+            await asyncio.to_thread(self._wait_room)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._size() >= self.batch_size, timeout=self.interval)
+                closed = self._closed
+            self._drain()
+            if closed:
+                return
+
+    def _drain(self):
+        with self._send_lock:
+            with self._cond:
+                runs, metrics, finishes = list(self._runs.values()), self._metrics, list(self._finishes.values())
+                self._runs, self._metrics, self._finishes = {}, [], {}
+                self._cond.notify_all()
+            if not runs and not metrics and not finishes:
+                return
+            try:
+                sb = self._client_factory()
+            except Exception as e:
+                self._dropped(len(runs) + len(metrics) + len(finishes))
+                print(f"⚠️ Supabase writer unavailable: {e}")
+                return
+            for i in range(0, len(runs), self.batch_size):
+                self._send(lambda chunk: sb.table("run").upsert(chunk, on_conflict="id").execute(), runs[i:i + self.batch_size])
+            # a separate call: bulk upserts need every row to carry the same columns
+            for i in range(0, len(finishes), self.batch_size):
+                self._send(lambda chunk: sb.table("run").upsert(chunk, on_conflict="id").execute(),
+                           finishes[i:i + self.batch_size])
+            for i in range(0, len(metrics), self.batch_size):
+                self._send(lambda chunk: sb.table("metric").insert(chunk).execute(), metrics[i:i + self.batch_size])
+
+    def _send(self, call: Callable, chunk: List[dict]):
+        for attempt in range(self.retries + 1):
+            try:
+                self.stats["requests"] += 1
+                call(chunk)
+                self.stats["rows"] += len(chunk)
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    self._dropped(len(chunk))
+                    print(f"⚠️ Supabase bulk write of {len(chunk)} rows failed: {e}")
+                    return
+                time.sleep(0.25 * (2 ** attempt))
+
+    def _dropped(self, rows: int):
+        with self._cond:
+            self.stats["dropped"] += rows
+            self._unreported += rows
+
+    def start_run(self, day: int, fingerprint: Optional[str] = None) -> str:
+        rid = str(uuid.uuid4())
+        row = {"id": rid, "day": day, "ok": None, "started_at": _now(), "finished_at": None, "artifacts": {},
+               "fingerprint": fingerprint}
+        with self._cond:
+            self._admit()
+            self._open[rid] = row
+            self._runs[rid] = row
+        return rid
+
+    def finish_run(self, run_id: str, ok: bool, artifacts: Dict[str, Any]):
+        with self._cond:
+            started = self._open.pop(run_id, None)
+            if started is not None:
+                self._admit()
+                self._runs[run_id] = {**started, "ok": ok, "finished_at": _now(), "artifacts": artifacts}
+                return
+            # run started elsewhere (its row is already sent): upsert just the finish columns
+            self._admit()
+            self._finishes[run_id] = {"id": run_id, "ok": ok, "finished_at": _now(), "artifacts": artifacts}
+
+    def add_metric(self, day: int, k: str, v: float):
+        with self._cond:
+            self._admit()
+            self._metrics.append({"day": day, "k": k, "v": v, "ts": _now()})
+            if self._size() >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self) -> bool:
+        # False if rows were dropped since the previous flush
+        self._drain()
+        with self._cond:
+            dropped, self._unreported = self._unreported, 0
+        return not dropped
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._drain()
+
+
+writer = BufferedWriter()
+atexit.register(writer.close)
 
 def init_db():
     # Tables should be created via SQL migration provided in README.
     return True
 
-def start_run(day: int) -> str:
-    sb = client()
-    now = datetime.datetime.utcnow().isoformat()
-    data = {
-        "day": day,
-        "ok": None,
-        "started_at": now,
-        "finished_at": None,
-        "artifacts": {}
-    }
-    res = sb.table("run").insert(data).execute()
-    rid = res.data[0]["id"]
-    return rid
+def start_run(day: int, fingerprint: Optional[str] = None) -> str:
+    return writer.start_run(day, fingerprint)
 
 def finish_run(run_id: str, ok: bool, artifacts: Dict[str, Any] = {}):
-    sb = client()
-    now = datetime.datetime.utcnow().isoformat()
-    sb.table("run").update({"ok": ok, "finished_at": now, "artifacts": artifacts}).eq("id", run_id).execute()
+    writer.finish_run(run_id, ok, artifacts)
 
 def add_metric(day: int, k: str, v: float):
+    writer.add_metric(day, k, v)
+
+def completed_runs(page: int = 1000) -> Dict[int, Optional[str]]:
+    # day -> plan fingerprint of its most recent successful run
+    writer.flush()
     sb = client()
-    now = datetime.datetime.utcnow().isoformat()
-    sb.table("metric").insert({"day": day, "k": k, "v": v, "ts": now}).execute()
+    done: Dict[int, Optional[str]] = {}
+    for i in itertools.count(0, page):
+        rows = sb.table("run").select("day,fingerprint").eq("ok", True).order("finished_at").range(i, i + page - 1).execute().data
+        for r in rows:
+            done[r["day"]] = r.get("fingerprint")
+        if len(rows) < page:
+            return done
+
+def flush():
+    return writer.flush()
+
+async def aflush():
+    return await asyncio.to_thread(writer.flush)
+
+async def wait_room():
+    await writer.wait_room()
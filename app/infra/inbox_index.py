@@ -0,0 +1,99 @@
+import os, json, bisect, threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+RECONCILE_SECONDS = float(os.environ.get("QIL_INBOX_RECONCILE_SECONDS", "0"))
+
+_FIELDS = ("received_at", "offset", "source", "status", "file")
+
+
+class InboxIndex:
+    """In-memory index over the inbox log.
+
+    Seeded once from disk, then fed by `/hook` as payloads are appended, so
+    counts, the latest entries and time-range lookups never touch the
+    directory. Entries are kept in arrival order, which is also
+    `received_at` order, so range queries are a bisect.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: List[tuple] = []
+        self._keys: List[str] = []
+        self.by_source: Counter = Counter()
+        self.by_status: Counter = Counter()
+        self.next_offset = 0  # first log offset not indexed yet
+
+    @property
+    def total(self) -> int:
+        return len(self._entries)
+
+    def add(self, record: dict) -> bool:
+        # `/hook` and `reconcile` can both see the same record; only the first one in indexes it
+        entry = tuple(record.get(f) for f in _FIELDS)
+        with self._lock:
+            if entry[1] is not None:
+                if entry[1] < self.next_offset:
+                    return False
+                self.next_offset = entry[1] + 1
+            self._insert(entry)
+        return True
+
+    def _insert(self, entry: tuple):
+        key = entry[0] or ""
+        if self._keys and key < self._keys[-1]:
+            i = bisect.bisect_right(self._keys, key)
+            self._keys.insert(i, key)
+            self._entries.insert(i, entry)
+        else:
+            self._keys.append(key)
+            self._entries.append(entry)
+        self.by_source[entry[2]] += 1
+        self.by_status[entry[3]] += 1
+
+    def seed(self, log, legacy_dir: Optional[Path] = None):
+        with self._lock:
+            self._entries, self._keys = [], []
+            self.by_source, self.by_status = Counter(), Counter()
+            # one-file-per-payload inbox from before the segmented log
+            for path in sorted(Path(legacy_dir).glob("*.json")) if legacy_dir else []:
+                try:
+                    rec = json.loads(path.read_text(encoding="utf-8"))
+                except Exception:
+                    continue
+                rec["received_at"] = datetime.utcfromtimestamp(path.stat().st_mtime).isoformat() + "Z"
+                rec["offset"] = None
+                self._insert(tuple(rec.get(f) for f in _FIELDS))
+            self.next_offset = 0
+            for rec in log.read(0):
+                self._insert(tuple(rec.get(f) for f in _FIELDS))
+                self.next_offset = rec["offset"] + 1
+        return self
+
+    def reconcile(self, log) -> int:
+        # index committed records that never reached `add` (a hook that failed after its append)
+        with self._lock:
+            start = self.next_offset
+        added = 0
+        for rec in log.read(start):
+            added += self.add(rec)
+        return added
+
+    def counts(self) -> dict:
+        with self._lock:
+            return {"total": self.total, "by_source": dict(self.by_source), "by_status": dict(self.by_status)}
+
+    def latest(self, n: int = 20) -> List[dict]:
+        with self._lock:
+            tail = self._entries[-n:] if n > 0 else []
+        return [dict(zip(_FIELDS, e)) for e in reversed(tail)]
+
+    def between(self, start: str = "", end: Optional[str] = None, limit: int = 1000) -> List[dict]:
+        # ISO-8601 UTC strings compare in time order
+        with self._lock:
+            lo = bisect.bisect_left(self._keys, start or "")
+            hi = bisect.bisect_right(self._keys, end) if end else len(self._keys)
+            rows = self._entries[lo:min(hi, lo + limit)]
+        return [dict(zip(_FIELDS, e)) for e in rows]
@@ -0,0 +1,272 @@
+import os, json, time, queue, threading
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the single-writer rule is not enforced
+    fcntl = None
+
+SEGMENT_BYTES = int(os.environ.get("QIL_INBOX_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+BATCH_MAX = int(os.environ.get("QIL_INBOX_BATCH", "256"))
+REPLICATE_BATCH = int(os.environ.get("QIL_INBOX_REPLICATE_BATCH", "200"))
+REPLICATE_INTERVAL = float(os.environ.get("QIL_INBOX_REPLICATE_INTERVAL", "2.0"))
+
+
+def _offset_of(line: bytes) -> Optional[int]:
+    # records are written as {"offset":N,...}: read N without decoding the rest
+    if not line.startswith(b'{"offset":'):
+        return None
+    end = line.find(b",", 10)
+    try:
+        return int(line[10:end if end > 0 else -2])
+    except ValueError:
+        return None
+
+
+class InboxLog:
+    """Append-only, segmented JSONL log of hook payloads.
+
+    Every record gets a monotonically increasing offset. Segments are named
+    after the first offset they hold (`00000000000000000042.jsonl`) and roll
+    over at `segment_bytes`. `append` only enqueues; a writer thread
+    group-commits (write + fsync) whatever has accumulated, and readers only
+    ever see committed records.
+
+    Offsets are handed out in memory, so a directory has exactly one
+    writer: the constructor takes an exclusive lock on `writer.lock` and
+    raises RuntimeError if another process holds it (run the webhook app
+    with a single worker).
+    """
+
+    def __init__(self, root, segment_bytes: int = SEGMENT_BYTES, batch_max: int = BATCH_MAX):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.batch_max = max(1, batch_max)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._fh = None
+        self._writer_lock = self._lock_dir()
+        self._seg_base, self._seg_size, self._next = self._recover()
+        self.committed = self._next
+        self.last_error: Optional[str] = None
+
+    def _lock_dir(self):
+        f = open(self.root / "writer.lock", "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                raise RuntimeError(f"inbox {self.root} already has a writer in another process")
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        return f
+
+    def segments(self) -> list:
+        return sorted(int(p.stem) for p in self.root.glob("*.jsonl") if p.stem.isdigit())
+
+    def _path(self, base: int) -> Path:
+        return self.root / f"{base:020d}.jsonl"
+
+    def _recover(self):
+        # -> (last segment, its size, next offset)
+        segs = self.segments()
+        if not segs:
+            return 0, 0, 0
+        path = self._path(segs[-1])
+        data = path.read_bytes()
+        # drop a torn trailing line left by a crash mid-write
+        keep = data.rfind(b"\n") + 1
+        if keep != len(data):
+            with open(path, "r+b") as f:
+                f.truncate(keep)
+        if not keep:
+            return segs[-1], 0, segs[-1]
+        last = data[data.rfind(b"\n", 0, keep - 1) + 1:keep]
+        return segs[-1], keep, json.loads(last)["offset"] + 1
+
+    @property
+    def next_offset(self) -> int:
+        return self._next
+
+    def append(self, record: dict) -> int:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="qil-inbox-log", daemon=True)
+                self._thread.start()
+            off = self._next
+            self._next += 1
+            self._q.put((off, record))
+        return off
+
+    def _loop(self):
+        while True:
+            batch = [self._q.get()]
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            # offsets are already handed out, so a failed batch is retried in place, never dropped
+            delay = 0.1
+            while not self._write(batch):
+                time.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+    def _write(self, batch: list) -> bool:
+        base, size = self._seg_base, self._seg_size
+        try:
+            self._append(batch)
+        except Exception as e:
+            self.last_error = f"offset {batch[0][0]}: {e}"
+            print(f"⚠️ Inbox write at offset {batch[0][0]} failed, retrying: {e}")
+            self._rollback(base, size)
+            return False
+        self.last_error = None
+        with self._cond:
+            self.committed = batch[-1][0] + 1
+            self._cond.notify_all()
+        return True
+
+    def _rollback(self, base: int, size: int):
+        # cut the log back to where the failed batch started so the retry rewrites it whole
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except OSError:
+                pass
+            self._fh = None
+        for b in self.segments():
+            if b > base:
+                self._path(b).unlink(missing_ok=True)
+        try:
+            with open(self._path(base), "r+b") as f:
+                f.truncate(size)
+        except OSError:
+            pass
+        self._seg_base, self._seg_size = base, size
+
+    def _append(self, batch: list):
+        for off, record in batch:
+            if self._seg_size >= self.segment_bytes and off > self._seg_base:
+                if self._fh is not None:
+                    self._fh.close()
+                    self._fh = None
+                self._seg_base, self._seg_size = off, 0
+            if self._fh is None:
+                self._fh = open(self._path(self._seg_base), "ab")
+            line = json.dumps({"offset": off, **record}, separators=(",", ":")).encode("utf-8") + b"\n"
+            self._fh.write(line)
+            self._seg_size += len(line)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def wait(self, offset: int, timeout: Optional[float] = None) -> bool:
+        # block until `offset` is durable
+        with self._cond:
+            return self._cond.wait_for(lambda: self.committed > offset, timeout=timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self.wait(self._next - 1, timeout) if self._next else True
+
+    def read(self, offset: int = 0, limit: Optional[int] = None) -> Iterator[dict]:
+        # replay committed records starting at `offset`
+        end = self.committed
+        if limit is not None:
+            end = min(end, offset + limit)
+        segs = self.segments()
+        start = 0
+        for i, base in enumerate(segs):
+            if base <= offset:
+                start = i
+        for base in segs[start:]:
+            if base >= end:
+                return
+            with open(self._path(base), "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        return  # the writer's tail, not flushed whole yet
+                    off = _offset_of(line)
+                    if off is None or off >= end:
+                        return
+                    if off < offset:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        return
+
+
+class Replicator:
+    """Ships committed inbox records to a Supabase table in batches.
+
+    Progress is kept in a cursor file next to the segments, so a restart
+    resumes where the last successful batch left off.
+    """
+
+    def __init__(self, log: InboxLog, client_factory: Callable, table: str = "qil_inbox",
+                 batch_size: int = REPLICATE_BATCH, interval: float = REPLICATE_INTERVAL):
+        self.log = log
+        self._client_factory = client_factory
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.cursor_path = log.root / "replicated.offset"
+        self.cursor = int(self.cursor_path.read_text() or 0) if self.cursor_path.exists() else 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="qil-inbox-replicator", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.replicate()
+
+    def _loop(self):
+        delay = self.interval
+        while not self._stop.is_set():
+            try:
+                sent = self.replicate()
+            except Exception as e:
+                # the cursor only moves after a successful insert, so the next pass retries the same records
+                print(f"⚠️ Inbox replication at offset {self.cursor} failed: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, 60.0)
+                continue
+            delay = self.interval
+            # a full batch means there is probably more waiting
+            if sent < self.batch_size:
+                self._stop.wait(self.interval)
+
+    def replicate(self) -> int:
+        records = list(self.log.read(self.cursor, self.batch_size))
+        if not records:
+            return 0
+        rows = [{
+            "source": r.get("source"),
+            "status": r.get("status"),
+            "file": r.get("file"),
+            "timestamp": r.get("timestamp") or r.get("received_at"),
+            "extra": r.get("extra") or {},
+        } for r in records]
+        try:
+            self._client_factory().table(self.table).insert(rows).execute()
+        except Exception as e:
+            print(f"⚠️ Inbox replication at offset {self.cursor} failed: {e}")
+            return 0
+        self.cursor = records[-1]["offset"] + 1
+        self.cursor_path.write_text(str(self.cursor))
+        return len(records)
@@ -0,0 +1,139 @@
+import os, time, uuid, socket, sqlite3, threading
+from typing import Iterable, List, Optional
+
+LEASE_TTL = float(os.environ.get("QIL_LEASE_TTL", "30"))
+LEASE_POLL = float(os.environ.get("QIL_LEASE_POLL", "1.0"))
+
+
+def new_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class SqliteLeaseStore:
+    """Lease table in the local SQLite ledger; the stand-in for Postgres.
+
+    A day is claimable if nobody holds it or its lease expired. `state` moves
+    leased -> done | failed, and finished rows are what other instances poll
+    to see dependency completion. Rows finished before `since` (the
+    claimer's start) are history rather than part of its run: a failed one
+    can be claimed again, and so can a done one when `rerun_done`.
+    """
+
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS lease (plan TEXT NOT NULL, day INTEGER NOT NULL, owner TEXT, state TEXT NOT NULL, "
+        "expires_at REAL, updated_at REAL, PRIMARY KEY (plan, day))",
+        "CREATE INDEX IF NOT EXISTS idx_lease_plan_state ON lease(plan, state, updated_at)",
+    ]
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for stmt in self.SCHEMA:
+            self._conn.execute(stmt)
+
+    def claim(self, plan: str, day: int, owner: str, ttl: float = LEASE_TTL,
+              since: float = 0.0, rerun_done: bool = False) -> bool:
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute(
+                "INSERT INTO lease(plan, day, owner, state, expires_at, updated_at) VALUES(?,?,?,'leased',?,?) "
+                "ON CONFLICT(plan, day) DO UPDATE SET owner=excluded.owner, state='leased', "
+                "expires_at=excluded.expires_at, updated_at=excluded.updated_at "
+                "WHERE (lease.state='leased' AND lease.expires_at < ?) OR (lease.updated_at < ? "
+                "AND (lease.state='failed' OR (? AND lease.state='done')))",
+                (plan, day, owner, now + ttl, now, now, since, int(rerun_done)))
+            return self._conn.total_changes > before
+
+    def heartbeat(self, plan: str, owner: str, days: Iterable[int], ttl: float = LEASE_TTL):
+        days = list(days)
+        if not days:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE lease SET expires_at=? WHERE plan=? AND day=? AND owner=? AND state='leased'",
+                [(time.time() + ttl, plan, d, owner) for d in days])
+
+    def complete(self, plan: str, day: int, owner: str, ok: bool):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE lease SET state=?, updated_at=? WHERE plan=? AND day=? AND owner=?",
+                ("done" if ok else "failed", time.time(), plan, day, owner))
+
+    def finished_since(self, plan: str, since: float) -> List[tuple]:
+        # -> [(day, state, updated_at)] for days completed anywhere after `since`
+        with self._lock:
+            return self._conn.execute(
+                "SELECT day, state, updated_at FROM lease WHERE plan=? AND state IN ('done','failed') AND updated_at > ?",
+                (plan, since)).fetchall()
+
+    def expired(self, plan: str) -> List[int]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT day FROM lease WHERE plan=? AND state='leased' AND expires_at < ?", (plan, time.time()))]
+
+    def live_plan(self, prefix: str) -> Optional[str]:
+        # the most recently active run of `prefix-*` that still holds unexpired leases
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT plan FROM lease WHERE plan LIKE ? AND state='leased' AND expires_at > ? "
+                "ORDER BY updated_at DESC LIMIT 1", (f"{prefix}-%", time.time())).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SupabaseLeaseStore:
+    """Same contract on Postgres via PostgREST; claiming goes through the
+    `claim_lease` function from schema.sql so it stays a single atomic upsert."""
+
+    def __init__(self, client_factory):
+        self._client_factory = client_factory
+
+    def claim(self, plan: str, day: int, owner: str, ttl: float = LEASE_TTL,
+              since: float = 0.0, rerun_done: bool = False) -> bool:
+        res = self._client_factory().rpc("claim_lease", {"p_plan": plan, "p_day": day, "p_owner": owner,
+                                                          "p_ttl_seconds": ttl, "p_since": since,
+                                                          "p_rerun_done": rerun_done}).execute()
+        return bool(res.data)
+
+    def heartbeat(self, plan: str, owner: str, days: Iterable[int], ttl: float = LEASE_TTL):
+        days = list(days)
+        if days:
+            self._client_factory().rpc("renew_leases", {"p_plan": plan, "p_owner": owner, "p_days": days,
+                                                        "p_ttl_seconds": ttl}).execute()
+
+    def complete(self, plan: str, day: int, owner: str, ok: bool):
+        self._client_factory().table("lease").update({"state": "done" if ok else "failed", "updated_at": time.time()}) \
+            .eq("plan", plan).eq("day", day).eq("owner", owner).execute()
+
+    def finished_since(self, plan: str, since: float) -> List[tuple]:
+        rows = self._client_factory().table("lease").select("day,state,updated_at").eq("plan", plan) \
+            .in_("state", ["done", "failed"]).gt("updated_at", since).execute().data
+        return [(r["day"], r["state"], r["updated_at"]) for r in rows]
+
+    def expired(self, plan: str) -> List[int]:
+        rows = self._client_factory().table("lease").select("day").eq("plan", plan).eq("state", "leased") \
+            .lt("expires_at", time.time()).execute().data
+        return [r["day"] for r in rows]
+
+    def live_plan(self, prefix: str) -> Optional[str]:
+        rows = self._client_factory().table("lease").select("plan").like("plan", f"{prefix}-%") \
+            .eq("state", "leased").gt("expires_at", time.time()).order("updated_at", desc=True).limit(1).execute().data
+        return rows[0]["plan"] if rows else None
+
+    def close(self):
+        pass
+
+
+def lease_store():
+    backend = os.environ.get("QIL_DB_BACKEND", "sqlite").lower()
+    if backend == "supabase":
+        from .db_supabase import client
+        return SupabaseLeaseStore(client)
+    from .db import DB_PATH
+    return SqliteLeaseStore(DB_PATH)
@@ -0,0 +1,221 @@
+import math, time, threading, contextvars
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# seconds; jobs range from a few ms (cached uploads) to minutes (process-mode behaviors)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        # look up once and keep the child; the hot path never formats labels
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def _label_str(self, values: Tuple[str, ...], extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._samples(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock", "fn")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+        self.fn: Optional[Callable[[], float]] = None
+
+    def inc(self, n: float = 1):
+        with self._lock:
+            self.value += n
+
+    def dec(self, n: float = 1):
+        with self._lock:
+            self.value -= n
+
+    def set(self, v: float):
+        self.value = v
+
+    def set_function(self, fn: Optional[Callable[[], float]]):
+        # sampled at scrape time, e.g. a queue's qsize
+        self.fn = fn
+
+    def get(self) -> float:
+        return self.fn() if self.fn is not None else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _child = _Value
+
+    def _samples(self, values, child):
+        return [f"{self.name}{self._label_str(values)} {_fmt(child.get())}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _samples(self, values, child):
+        try:
+            v = child.get()
+        except Exception:
+            return []  # callback's owner is gone
+        return [f"{self.name}{self._label_str(values)} {_fmt(v)}"]
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v: float):
+        i = bisect_left(self.bounds, v)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_h", "_t0")
+
+    def __init__(self, h: _Buckets):
+        self._h = h
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._h.observe(time.perf_counter() - self._t0)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return _Buckets(self.buckets)
+
+    def _samples(self, values, child):
+        with child._lock:
+            counts, total, n = list(child.counts), child.sum, child.count
+        out, acc = [], 0
+        for bound, c in zip(self.buckets + (math.inf,), counts):
+            acc += c
+            le = 'le="%s"' % _fmt(bound)
+            out.append(f"{self.name}_bucket{self._label_str(values, le)} {acc}")
+        labels = self._label_str(values)
+        out.append(f"{self.name}_sum{labels} {_fmt(total)}")
+        out.append(f"{self.name}_count{labels} {n}")
+        return out
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def add(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+JOB_EXEC = REGISTRY.add(Histogram("qil_job_exec_seconds", "Behavior run time per job.", ["role"]))
+JOB_UPLOAD = REGISTRY.add(Histogram("qil_job_upload_seconds", "Artifact upload time (upload_file, incl. retries).", ["role"]))
+JOB_DB = REGISTRY.add(Histogram("qil_job_db_seconds", "Time a job spends in ledger calls.", ["role"]))
+JOBS = REGISTRY.add(Counter("qil_jobs_total", "Finished jobs by outcome.", ["role", "outcome"]))
+JOB_TIMEOUTS = REGISTRY.add(Counter("qil_job_timeouts_total", "Jobs cancelled at their role deadline.", ["role"]))
+JOB_HEDGES = REGISTRY.add(Counter("qil_job_hedges_total", "Hedged re-executions launched / won.", ["role", "outcome"]))
+UPLOAD_FAILURES = REGISTRY.add(Counter("qil_upload_failures_total", "Uploads that failed after all retries.", ["role"]))
+LEDGER_COMMIT = REGISTRY.add(Histogram("qil_ledger_commit_seconds", "SQLite ledger batch write + commit time."))
+LEDGER_BATCH = REGISTRY.add(Histogram("qil_ledger_batch_rows", "Statements per ledger commit.",
+                                      buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)))
+IN_FLIGHT = REGISTRY.add(Gauge("qil_jobs_in_flight", "Jobs currently executing."))
+QUEUE_DEPTH = REGISTRY.add(Gauge("qil_ready_queue_depth", "Ready days waiting for a worker."))
+UPLOADS_PENDING = REGISTRY.add(Gauge("qil_uploads_pending", "Uploads queued or in flight."))
+CONCURRENCY_LIMIT = REGISTRY.add(Gauge("qil_concurrency_limit", "Current worker limit (adaptive or set live)."))
+
+
+class RoleMetrics:
+    """Every instrument a job of one role touches, bound once."""
+
+    __slots__ = ("exec", "upload", "db", "ok", "failed", "upload_failed", "timeouts", "hedged", "hedge_wins")
+
+    def __init__(self, role: str):
+        self.exec = JOB_EXEC.labels(role)
+        self.upload = JOB_UPLOAD.labels(role)
+        self.db = JOB_DB.labels(role)
+        self.ok = JOBS.labels(role, "ok")
+        self.failed = JOBS.labels(role, "failed")
+        self.upload_failed = UPLOAD_FAILURES.labels(role)
+        self.timeouts = JOB_TIMEOUTS.labels(role)
+        self.hedged = JOB_HEDGES.labels(role, "launched")
+        self.hedge_wins = JOB_HEDGES.labels(role, "won")
+
+
+_roles: Dict[str, RoleMetrics] = {}
+_roles_lock = threading.Lock()
+
+# the role of the job running in the current task; uploads are attributed to it
+current: contextvars.ContextVar[Optional[RoleMetrics]] = contextvars.ContextVar("qil_role_metrics", default=None)
+
+
+def for_role(role: str) -> RoleMetrics:
+    m = _roles.get(role)
+    if m is None:
+        with _roles_lock:
+            m = _roles.get(role) or _roles.setdefault(role, RoleMetrics(role))
+    return m
+
+
+def render() -> str:
+    return REGISTRY.render()
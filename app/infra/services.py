@@ -0,0 +1,119 @@
+import os, sys, time, importlib, threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# comma-separated services to build in the background at startup, e.g. "supabase,ledger"
+PREWARM = [s.strip() for s in os.environ.get("QIL_PREWARM", "").split(",") if s.strip()]
+
+_imports: List[dict] = []
+
+
+@contextmanager
+def import_timer(label: str):
+    # records how long the imports inside took and how many modules they pulled in
+    before, t0 = len(sys.modules), time.perf_counter()
+    try:
+        yield
+    finally:
+        if len(sys.modules) > before:  # already imported by someone else: nothing to report
+            _imports.append({"label": label, "ms": round((time.perf_counter() - t0) * 1000, 1),
+                             "modules": len(sys.modules) - before})
+
+
+class Services:
+    """Lazily built process-wide services.
+
+    Each service is a zero-argument factory run on first `get` (once, even
+    when several threads ask at the same time); whatever it imports is only
+    paid for then. `prewarm` builds some ahead of time, `report` shows which
+    ones exist and what building them cost.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable] = {}
+        self._values: Dict[str, object] = {}
+        self._errors: Dict[str, str] = {}
+        self._timings: Dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable):
+        self._factories[name] = factory
+
+    def ready(self, name: str) -> bool:
+        return name in self._values
+
+    def get(self, name: str):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._values:
+                before, t0 = len(sys.modules), time.perf_counter()
+                try:
+                    value = self._factories[name]()
+                except Exception as e:
+                    self._errors[name] = str(e) or type(e).__name__
+                    raise
+                finally:
+                    self._timings[name] = {"ms": round((time.perf_counter() - t0) * 1000, 1),
+                                           "modules": len(sys.modules) - before}
+                self._errors.pop(name, None)
+                self._values[name] = value
+            return self._values[name]
+
+    def prewarm(self, names: Optional[Iterable[str]] = None) -> Dict[str, Optional[str]]:
+        # -> name -> error (None when it came up)
+        out = {}
+        for name in names if names is not None else self._factories:
+            try:
+                self.get(name)
+                out[name] = None
+            except Exception as e:
+                out[name] = str(e) or type(e).__name__
+        return out
+
+    def report(self) -> dict:
+        return {
+            "imports": list(_imports),
+            "services": {n: {"ready": n in self._values, **self._timings.get(n, {}),
+                             **({"error": self._errors[n]} if n in self._errors else {})}
+                         for n in self._factories},
+        }
+
+    def summary(self) -> str:
+        parts = [f"{i['label']} {i['ms']:.0f}ms" for i in _imports]
+        lazy = [n for n in self._factories if n not in self._values]
+        return f"imports: {', '.join(parts) or '-'}; deferred: {', '.join(lazy) or '-'}"
+
+
+def _supabase():
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        raise RuntimeError("Supabase env vars missing")
+    try:
+        from supabase import create_client
+    except Exception:
+        raise RuntimeError("supabase-py not installed. Add `supabase>=2` to requirements.")
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+def _ledger():
+    # the run ledger backend module (see app/infra/db.py and db_supabase.py)
+    backend = os.environ.get("QIL_DB_BACKEND", "sqlite").lower()
+    return importlib.import_module("app.infra.db_supabase" if backend == "supabase" else "app.infra.db")
+
+
+services = Services()
+services.register("supabase", _supabase)
+services.register("ledger", _ledger)
+services.register("storage", lambda: importlib.import_module("app.infra.storage_supabase"))
+
+
+def supabase_client():
+    return services.get("supabase")
+
+
+def supabase_configured() -> bool:
+    return bool(SUPABASE_URL and SUPABASE_KEY)
@@ -1,49 +1,113 @@
-import os, datetime
+import os, json, time, hashlib, threading
 from typing import Optional
 
-try:
-    from supabase import create_client
-except Exception:
-    create_client = None
+from .services import supabase_client
 
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 QIL_BUCKET = os.environ.get("QIL_BUCKET", "artifacts")
 QIL_PUBLIC_URL = os.environ.get("QIL_PUBLIC_URL")  # optional CDN/public base
-
-_client = None
+QIL_ARTIFACT_INDEX = os.environ.get("QIL_ARTIFACT_INDEX", "qil_artifacts.jsonl")  # content hash -> URL
+QIL_FORCE_UPLOAD = os.environ.get("QIL_FORCE_UPLOAD", "").lower() in ("1", "true", "yes")
+SIGNED_TTL = 7 * 24 * 3600
 
 def client():
-    global _client
-    if _client is None:
-        if not (SUPABASE_URL and SUPABASE_KEY):
-            raise RuntimeError("Supabase env missing")
-        if create_client is None:
-            raise RuntimeError("supabase-py not installed")
-        _client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    return _client
-
-def upload_file(local_path: str, dest_prefix: str = "artifacts") -> Optional[str]:
-    sb = client()
-    name = os.path.basename(local_path)
-    ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    key = f"{dest_prefix}/{ts}_{name}"
-    with open(local_path, "rb") as f:
-        sb.storage.from_(QIL_BUCKET).upload(key, f, {"contentType": _guess_ct(name)}, upsert=True)
-    # Try to get public URL
+    return supabase_client()
+
+
+class ArtifactIndex:
+    """Persistent `(prefix, sha256) -> url` map kept as an append-only JSONL file."""
+
+    def __init__(self, path: str = QIL_ARTIFACT_INDEX):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[dict] = None
+        self.stats = {"uploads": 0, "hits": 0, "bytes_uploaded": 0, "bytes_saved": 0, "requests_saved": 0}
+
+    def count(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self.stats[k] += v
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            e = json.loads(line)
+                        except ValueError:
+                            continue
+                        entries[(e["prefix"], e["sha256"])] = e
+            self._entries = entries
+        return self._entries
+
+    def get(self, prefix: str, digest: str) -> Optional[dict]:
+        with self._lock:
+            e = self._load().get((prefix, digest))
+        # signed URLs expire; treat a nearly-expired one as a miss for the URL only
+        if e and e.get("expires_at") and e["expires_at"] < time.time() + 3600:
+            return {**e, "url": None}
+        return e
+
+    def put(self, prefix: str, digest: str, key: str, url: Optional[str], expires_at: Optional[float]):
+        e = {"prefix": prefix, "sha256": digest, "key": key, "url": url, "expires_at": expires_at}
+        with self._lock:
+            self._load()[(prefix, digest)] = e
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(e) + "\n")
+
+
+index = ArtifactIndex()
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _url_for(sb, key: str):
+    # -> (url, expires_at)
     if QIL_PUBLIC_URL:
-        return f"{QIL_PUBLIC_URL}/{key}"
+        return f"{QIL_PUBLIC_URL}/{key}", None
     # Fallback to signed URL (valid 7 days)
     try:
-        signed = sb.storage.from_(QIL_BUCKET).create_signed_url(key, 7*24*3600)
-        return signed.get("signedURL") or signed.get("signed_url")
+        signed = sb.storage.from_(QIL_BUCKET).create_signed_url(key, SIGNED_TTL)
+        return signed.get("signedURL") or signed.get("signed_url"), time.time() + SIGNED_TTL
     except Exception:
         # last resort: public URL method (if bucket public)
         try:
-            pub = sb.storage.from_(QIL_BUCKET).get_public_url(key)
-            return pub
+            return sb.storage.from_(QIL_BUCKET).get_public_url(key), None
         except Exception:
-            return None
+            return None, None
+
+def upload_file(local_path: str, dest_prefix: str = "artifacts", force: bool = False) -> Optional[str]:
+    # Objects are content-addressed: identical bytes map to one object, and a
+    # hit in the local index skips both the upload and the URL round trip.
+    name = os.path.basename(local_path)
+    digest = _sha256(local_path)
+    size = os.path.getsize(local_path)
+    key = f"{dest_prefix}/{digest[:2]}/{digest}_{name}"
+    hit = None if (force or QIL_FORCE_UPLOAD) else index.get(dest_prefix, digest)
+    if hit and hit.get("url"):
+        index.count(hits=1, bytes_saved=size, requests_saved=1 if QIL_PUBLIC_URL else 2)
+        return hit["url"]
+    sb = client()
+    if hit:
+        # object already stored, only its signed URL went stale
+        key = hit["key"]
+        index.count(bytes_saved=size, requests_saved=1)
+    else:
+        with open(local_path, "rb") as f:
+            sb.storage.from_(QIL_BUCKET).upload(key, f, {"contentType": _guess_ct(name)}, upsert=True)
+        index.count(uploads=1, bytes_uploaded=size)
+    url, expires_at = _url_for(sb, key)
+    if url:
+        index.put(dest_prefix, digest, key, url, expires_at)
+    return url
+
+def upload_stats() -> dict:
+    return dict(index.stats)
 
 def _guess_ct(name: str) -> str:
     lower = name.lower()
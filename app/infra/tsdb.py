@@ -0,0 +1,425 @@
+import os, math, time, pickle, threading
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from several processes are not serialized
+    fcntl = None
+
+TSDB_PATH = os.environ.get("QIL_TSDB_PATH", os.path.join(".qil_cache", "metrics.tsdb"))
+RAW_SECONDS = float(os.environ.get("QIL_TSDB_RAW_SECONDS", str(2 * 86400)))
+RAW_POINTS = int(os.environ.get("QIL_TSDB_RAW_POINTS", "65536"))  # per key, whatever the age
+HOURLY_SECONDS = float(os.environ.get("QIL_TSDB_HOURLY_SECONDS", str(35 * 86400)))
+DAILY_SECONDS = float(os.environ.get("QIL_TSDB_DAILY_SECONDS", str(400 * 86400)))
+CHUNK_POINTS = 1024
+HOUR, DAY = 3600, 86400
+TIERS = ("raw", "hourly", "daily")
+SNAPSHOT_VERSION = 1
+# unsaved points are written out by a background save once there are this many, or they are this old
+SAVE_POINTS = int(os.environ.get("QIL_TSDB_SAVE_POINTS", "50000"))
+SAVE_SECONDS = float(os.environ.get("QIL_TSDB_SAVE_SECONDS", "300"))
+
+# sketch: values within 2% of each other share a bin, so p95 from a rolled-up bucket is within ~2%
+_ALPHA = 0.02
+_LOG_GAMMA = math.log((1 + _ALPHA) / (1 - _ALPHA))
+_MAX_BINS = 256
+
+
+class Sketch:
+    """Mergeable log-bucketed histogram (DDSketch-style) for quantiles of rolled-up buckets."""
+
+    __slots__ = ("pos", "neg", "zeros")
+
+    def __init__(self):
+        self.pos: Dict[int, int] = {}
+        self.neg: Dict[int, int] = {}
+        self.zeros = 0
+
+    def add(self, v: float, n: int = 1):
+        if v == 0 or not math.isfinite(v):
+            self.zeros += n
+            return
+        bins = self.pos if v > 0 else self.neg
+        k = math.ceil(math.log(abs(v)) / _LOG_GAMMA)
+        bins[k] = bins.get(k, 0) + n
+        if len(bins) > _MAX_BINS:
+            # fold the smallest magnitudes together; the tail we report on stays exact to 2%
+            lo = sorted(bins)[:2]
+            bins[lo[1]] += bins.pop(lo[0])
+
+    def merge(self, other: "Sketch"):
+        for mine, theirs in ((self.pos, other.pos), (self.neg, other.neg)):
+            for k, n in theirs.items():
+                mine[k] = mine.get(k, 0) + n
+        self.zeros += other.zeros
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = sum(self.pos.values()) + sum(self.neg.values()) + self.zeros
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for k in sorted(self.neg, reverse=True):
+            seen += self.neg[k]
+            if seen > rank:
+                return -2 * math.exp(k * _LOG_GAMMA) / (1 + math.exp(_LOG_GAMMA))
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.pos):
+            seen += self.pos[k]
+            if seen > rank:
+                return 2 * math.exp(k * _LOG_GAMMA) / (1 + math.exp(_LOG_GAMMA))
+        return 2 * math.exp(max(self.pos) * _LOG_GAMMA) / (1 + math.exp(_LOG_GAMMA))
+
+    def __getstate__(self):
+        return self.pos, self.neg, self.zeros
+
+    def __setstate__(self, state):
+        self.pos, self.neg, self.zeros = state
+
+
+class Agg:
+    """count / sum / min / max plus a quantile sketch for one rollup bucket."""
+
+    __slots__ = ("count", "sum", "min", "max", "sketch")
+
+    def __init__(self):
+        self.count, self.sum, self.min, self.max = 0, 0.0, math.inf, -math.inf
+        self.sketch = Sketch()
+
+    def add(self, v: float):
+        self.count += 1
+        self.sum += v
+        self.min = min(self.min, v)
+        self.max = max(self.max, v)
+        self.sketch.add(v)
+
+    def merge(self, other: "Agg"):
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def result(self) -> dict:
+        if not self.count:
+            return {"count": 0, "sum": 0.0, "mean": None, "min": None, "max": None, "p95": None}
+        # a sketch bin's midpoint can fall outside what was actually seen (all 1.0 -> 0.98)
+        p95 = min(max(self.sketch.quantile(0.95), self.min), self.max)
+        return {"count": self.count, "sum": self.sum, "mean": self.sum / self.count,
+                "min": self.min, "max": self.max, "p95": p95}
+
+    def __getstate__(self):
+        return self.count, self.sum, self.min, self.max, self.sketch
+
+    def __setstate__(self, state):
+        self.count, self.sum, self.min, self.max, self.sketch = state
+
+
+class Chunk:
+    # up to CHUNK_POINTS raw points: ms timestamps as uint32 deltas from the previous one
+    __slots__ = ("base", "last", "deltas", "values", "days")
+
+    def __init__(self, ts_ms: int):
+        self.base = self.last = ts_ms
+        self.deltas = array("I")
+        self.values = array("d")
+        self.days = array("i")  # plan day that emitted each point
+
+    def fits(self, ts_ms: int) -> bool:
+        return len(self.values) < CHUNK_POINTS and 0 <= ts_ms - self.last < 1 << 32
+
+    def append(self, ts_ms: int, v: float, day: int):
+        self.deltas.append(ts_ms - self.last)
+        self.last = ts_ms
+        self.values.append(v)
+        self.days.append(day)
+
+    def points(self):
+        t = self.base
+        for d, v, day in zip(self.deltas, self.values, self.days):
+            t += d
+            yield t, v, day
+
+    def __getstate__(self):
+        return self.base, self.last, self.deltas.tobytes(), self.values.tobytes(), self.days.tobytes()
+
+    def __setstate__(self, state):
+        self.base, self.last, deltas, values, days = state
+        self.deltas, self.values, self.days = array("I"), array("d"), array("i")
+        self.deltas.frombytes(deltas)
+        self.values.frombytes(values)
+        self.days.frombytes(days)
+
+
+class Series:
+    __slots__ = ("chunks", "hourly", "daily", "points")
+
+    def __init__(self):
+        self.chunks: List[Chunk] = []
+        self.hourly: Dict[int, Agg] = {}  # bucket start (s) -> agg
+        self.daily: Dict[int, Agg] = {}
+        self.points = 0  # raw points held
+
+    def add(self, ts: float, v: float, day: int):
+        ts_ms = int(ts * 1000)
+        if not self.chunks or not self.chunks[-1].fits(ts_ms):
+            self.chunks.append(Chunk(ts_ms))
+        self.chunks[-1].append(ts_ms, v, day)
+        self.points += 1
+        for tier, width in ((self.hourly, HOUR), (self.daily, DAY)):
+            b = int(ts) // width * width
+            agg = tier.get(b)
+            if agg is None:
+                agg = tier[b] = Agg()
+            agg.add(v)
+
+    def merge(self, other: "Series"):
+        # points another writer added since its last save, appended in order
+        for c in other.chunks:
+            for ts_ms, v, day in c.points():
+                if not self.chunks or not self.chunks[-1].fits(ts_ms):
+                    self.chunks.append(Chunk(ts_ms))
+                self.chunks[-1].append(ts_ms, v, day)
+        self.points += other.points
+        for mine, theirs in ((self.hourly, other.hourly), (self.daily, other.daily)):
+            for b, agg in theirs.items():
+                mine.setdefault(b, Agg()).merge(agg)
+
+    def prune(self, now: float):
+        # whole chunks only: drop the oldest while past the raw age or point budget
+        cutoff_ms = (now - RAW_SECONDS) * 1000
+        while len(self.chunks) > 1 and (self.chunks[0].last < cutoff_ms or self.points - len(self.chunks[0].values) >= RAW_POINTS):
+            self.points -= len(self.chunks.pop(0).values)
+        for tier, keep in ((self.hourly, HOURLY_SECONDS), (self.daily, DAILY_SECONDS)):
+            for b in [b for b in tier if b < now - keep]:
+                del tier[b]
+
+    def __getstate__(self):
+        return self.chunks, self.hourly, self.daily, self.points
+
+    def __setstate__(self, state):
+        self.chunks, self.hourly, self.daily, self.points = state
+
+
+class MetricStore:
+    """Per-key time series for job metrics, in three tiers.
+
+    raw: every point in columnar chunks (delta-encoded ms timestamps,
+    float64 values, plan day), kept for `QIL_TSDB_RAW_SECONDS` and at most
+    `QIL_TSDB_RAW_POINTS` per key. hourly / daily: count, sum, min, max and
+    a quantile sketch per bucket, kept for `QIL_TSDB_HOURLY_SECONDS` /
+    `QIL_TSDB_DAILY_SECONDS`. Old data is pruned as new chunks open and on
+    `save`, so memory and the snapshot file stay bounded however long the
+    orchestrator keeps running.
+
+    Several processes (uvicorn workers, instances on one host) can share
+    the snapshot: `save` takes a lock file, re-reads the snapshot, merges
+    in the points this process added since its last save and writes the
+    result back, so no writer's points replace another's. A background
+    save also runs every `QIL_TSDB_SAVE_POINTS` points or
+    `QIL_TSDB_SAVE_SECONDS`, so what waits for the next save stays small
+    on a server that runs for days between flushes.
+    """
+
+    def __init__(self, path: Optional[str] = TSDB_PATH):
+        self.path = path
+        self.series: Dict[str, Series] = {}
+        self._unsaved: Dict[str, Series] = {}  # added since the last save
+        self._unsaved_points = 0
+        self._saved_at = time.monotonic()
+        self._saving = False
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        if self._loaded:
+            return self
+        self._loaded = True
+        if self.path:
+            self.series.update(self._read())
+        return self
+
+    def _read(self) -> Dict[str, Series]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f:
+                header = pickle.load(f)
+                if header.get("version") == SNAPSHOT_VERSION:
+                    return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError, TypeError) as e:
+            print(f"⚠️ Metric store not loaded: {e}")
+        return {}
+
+    @contextmanager
+    def _file_lock(self):
+        with open(f"{self.path}.lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def add(self, k: str, v: float, day: int = 0, ts: Optional[float] = None):
+        if not self._loaded:
+            self.load()
+        ts = time.time() if ts is None else ts
+        due = False
+        with self._lock:
+            s = self.series.get(k)
+            if s is None:
+                s = self.series[k] = Series()
+            chunks = len(s.chunks)
+            s.add(ts, v, day)
+            if len(s.chunks) != chunks:
+                s.prune(ts)
+            if self.path:
+                u = self._unsaved.get(k)
+                if u is None:
+                    u = self._unsaved[k] = Series()
+                u.add(ts, v, day)
+                self._unsaved_points += 1
+                due = not self._saving and (self._unsaved_points >= SAVE_POINTS
+                                            or time.monotonic() - self._saved_at >= SAVE_SECONDS)
+                if due:
+                    self._saving = True
+        if due:
+            threading.Thread(target=self._autosave, name="qil-tsdb-save", daemon=True).start()
+
+    def _autosave(self):
+        try:
+            self.save()
+        finally:
+            self._saving = False
+
+    @staticmethod
+    def _prune(series: Dict[str, Series], now: float):
+        for k in list(series):
+            s = series[k]
+            s.prune(now)
+            if not s.daily:
+                del series[k]  # nothing left inside any retention window
+
+    def prune(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._prune(self.series, now)
+
+    def save(self):
+        if not self.path or not self._loaded:
+            return
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, {}
+            self._unsaved_points, self._saved_at = 0, time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with self._file_lock():
+                # whatever the other writers saved, plus ours
+                series = self._read()
+                for k, s in unsaved.items():
+                    series.setdefault(k, Series()).merge(s)
+                self._prune(series, time.time())
+                with open(tmp, "wb") as f:
+                    pickle.dump({"version": SNAPSHOT_VERSION, "saved_at": time.time()}, f)
+                    pickle.dump(series, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Metric store not saved: {e}")
+            with self._lock:  # keep them for the next save, within the same retention as the store
+                for k, s in self._unsaved.items():
+                    unsaved.setdefault(k, Series()).merge(s)
+                self._prune(unsaved, time.time())
+                self._unsaved = unsaved
+                self._unsaved_points = sum(u.points for u in unsaved.values())
+            return
+        with self._lock:
+            # the merged snapshot becomes our view, with whatever was added while it was written
+            for k, s in self._unsaved.items():
+                series.setdefault(k, Series()).merge(s)
+            self.series = series
+
+    def keys(self) -> List[str]:
+        self.load()
+        return sorted(self.series)
+
+    def query(self, k: str, start: Optional[float] = None, end: Optional[float] = None,
+              step: Optional[float] = None, tier: str = "auto", day: Optional[int] = None) -> dict:
+        """Aggregate `k` over [start, end) (epoch seconds; default: everything kept).
+
+        Without `step` one aggregate covers the window, otherwise one per
+        `step` seconds. tier="auto" uses raw points while the window is still
+        inside raw retention, then hourly, then daily buckets; `day` (plan
+        day) filtering needs raw points. Each aggregate has count, sum, mean,
+        min, max and p95 (exact from raw, within ~2% from rollups).
+        """
+        self.load()
+        now = time.time()
+        end = now if end is None else end
+        if tier == "auto":
+            if day is not None or start is not None and start >= now - RAW_SECONDS:
+                tier = "raw"
+            elif start is not None and start >= now - HOURLY_SECONDS and (step is None or step < DAY):
+                tier = "hourly"
+            else:
+                tier = "daily"
+        if tier not in TIERS:
+            raise ValueError(f"tier must be one of {('auto',) + TIERS}, got {tier!r}")
+        if day is not None and tier != "raw":
+            raise ValueError("filtering by plan day needs the raw tier")
+        width = {"raw": 0, "hourly": HOUR, "daily": DAY}[tier]
+        if step is not None and step <= 0:
+            raise ValueError("step must be > 0")
+        if step is not None and width and step % width:
+            raise ValueError(f"step must be a multiple of {width}s on the {tier} tier")
+        lo = -math.inf if start is None else start
+        origin = 0 if start is None else start
+        bucket_of = (lambda t: int((t - origin) // step)) if step else (lambda t: 0)
+        buckets: Dict[int, Agg] = {}
+        with self._lock:
+            s = self.series.get(k)
+            if s is not None and tier == "raw":
+                values: Dict[int, List[float]] = {}
+                for c in s.chunks:
+                    if c.last / 1000 < lo or c.base / 1000 >= end:
+                        continue
+                    for t_ms, v, d in c.points():
+                        t = t_ms / 1000
+                        if lo <= t < end and (day is None or d == day):
+                            values.setdefault(bucket_of(t), []).append(v)
+                for b, vs in values.items():
+                    agg = buckets[b] = Agg()
+                    agg.count, agg.sum, agg.min, agg.max = len(vs), math.fsum(vs), min(vs), max(vs)
+                    agg.sketch = _Exact(vs)
+            elif s is not None:
+                for b0, agg in (s.hourly if tier == "hourly" else s.daily).items():
+                    if lo <= b0 < end:
+                        b = bucket_of(b0)
+                        if b not in buckets:
+                            buckets[b] = Agg()
+                        buckets[b].merge(agg)
+        head = {"key": k, "tier": tier, "start": start, "end": end}
+        if not step:
+            return {**head, **(buckets[0] if buckets else Agg()).result()}
+        return {**head, "step": step,
+                "points": [{"t": origin + b * step, **agg.result()} for b, agg in sorted(buckets.items())]}
+
+
+class _Exact:
+    # stands in for a Sketch when the raw values are at hand
+    def __init__(self, values: List[float]):
+        self.values = sorted(values)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.values:
+            return None
+        return self.values[min(len(self.values) - 1, int(q * len(self.values)))]
+
+
+store = MetricStore()
@@ -0,0 +1,118 @@
+import os, time, asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from . import metrics
+from .services import services
+
+UPLOAD_WORKERS = int(os.environ.get("QIL_UPLOAD_WORKERS", "8"))
+UPLOAD_QUEUE = int(os.environ.get("QIL_UPLOAD_QUEUE", "256"))
+UPLOAD_RETRIES = int(os.environ.get("QIL_UPLOAD_RETRIES", "3"))
+UPLOAD_BACKOFF = float(os.environ.get("QIL_UPLOAD_BACKOFF", "0.5"))
+
+
+class Uploader:
+    """Async front for the blocking `upload_file`.
+
+    Uploads run on a dedicated thread pool (`workers` at a time); at most
+    `queue_size` uploads may be queued or in flight, after which `submit`
+    waits, pushing back on the behaviors producing files.
+    """
+
+    def __init__(self, workers: int = UPLOAD_WORKERS, queue_size: int = UPLOAD_QUEUE,
+                 retries: int = UPLOAD_RETRIES, backoff: float = UPLOAD_BACKOFF):
+        self.workers = max(1, workers)
+        self.queue_size = max(self.workers, queue_size)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._pending: set = set()
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.queue_size)
+            self._pending = set()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qil-upload")
+
+    async def submit(self, local_path: str, dest_prefix: str = "artifacts", force: bool = False) -> asyncio.Future:
+        # returns a future resolving to the artifact URL; waits only if the queue is full
+        self._bind()
+        await self._slots.acquire()
+        # executor threads don't inherit the task's context; hand the job's role over explicitly
+        m = metrics.current.get() or metrics.for_role("none")
+        # the slot belongs to the pool job, not to the awaiting future: cancelling the future
+        # must not free it while a thread is still sending, so the worker releases it itself
+        loop, slots, job = self._loop, self._slots, None
+
+        def done():
+            # runs `_release` on the loop, by which time `job` below is bound
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(lambda: self._release(slots, job))
+
+        job = self._pool.submit(self._run, done, local_path, dest_prefix, force, m)
+        self._pending.add(job)
+        # a job cancelled before a thread picked it up never reaches _run's finally
+        job.add_done_callback(lambda j: j.cancelled() and done())
+        return asyncio.wrap_future(job, loop=self._loop)
+
+    async def upload(self, local_path: str, dest_prefix: str = "artifacts", force: bool = False) -> Optional[str]:
+        return await (await self.submit(local_path, dest_prefix, force))
+
+    def _release(self, slots: asyncio.Semaphore, job: Future):
+        self._pending.discard(job)
+        slots.release()
+
+    def _run(self, done, *args) -> Optional[str]:
+        try:
+            return self._upload(*args)
+        finally:
+            done()
+
+    def _upload(self, local_path: str, dest_prefix: str, force: bool = False,
+                m: Optional[metrics.RoleMetrics] = None) -> Optional[str]:
+        m = m or metrics.for_role("none")
+        t0 = time.perf_counter()
+        try:
+            storage_supabase = services.get("storage")
+            storage_supabase.client()  # config errors are not worth retrying
+            for attempt in range(self.retries + 1):
+                try:
+                    return storage_supabase.upload_file(local_path, dest_prefix, force)
+                except Exception:
+                    if attempt == self.retries:
+                        raise
+                    time.sleep(self.backoff * (2 ** attempt))
+        except Exception:
+            m.upload_failed.inc()
+            raise
+        finally:
+            m.upload.observe(time.perf_counter() - t0)
+
+    async def drain(self):
+        if self._pending:
+            await asyncio.gather(*(asyncio.wrap_future(j) for j in list(self._pending)),
+                                 return_exceptions=True)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+uploader = Uploader()
+# a forked child (process-mode behaviors) must not reuse the parent's pool threads
+os.register_at_fork(after_in_child=uploader.__init__)
+metrics.UPLOADS_PENDING.labels().set_function(lambda: len(uploader._pending))
+
+
+async def submit(local_path: str, dest_prefix: str = "artifacts", force: bool = False) -> asyncio.Future:
+    return await uploader.submit(local_path, dest_prefix, force)
+
+
+async def upload(local_path: str, dest_prefix: str = "artifacts", force: bool = False) -> Optional[str]:
+    return await uploader.upload(local_path, dest_prefix, force)
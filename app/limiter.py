@@ -0,0 +1,132 @@
+import os, asyncio
+from collections import deque
+from typing import Optional
+
+# a window is congested if its mean job latency exceeds the baseline by this factor...
+LATENCY_TOLERANCE = float(os.environ.get("QIL_ADAPTIVE_TOLERANCE", "1.5"))
+# ...or more than this share of its jobs failed
+MAX_ERROR_RATE = float(os.environ.get("QIL_ADAPTIVE_MAX_ERRORS", "0.05"))
+BACKOFF = float(os.environ.get("QIL_ADAPTIVE_BACKOFF", "0.75"))
+MIN_WINDOW = 8
+
+
+class ConcurrencyLimiter:
+    """Resizable async semaphore with an optional AIMD controller.
+
+    Workers hold a slot for the duration of one job. The limit can be moved
+    at any time (`set`), and when `adaptive` the orchestrator feeds every
+    job's latency and outcome into `record`: once per window of roughly
+    `limit` completions the limit grows by ~sqrt(limit) if the window looked
+    healthy, or is multiplied by `backoff` if latency rose past `tolerance`
+    times the baseline or the error rate went over `max_error_rate`; jobs
+    already in flight at a decrease are left out of the next window. The
+    baseline follows improvements immediately and regressions only slowly,
+    so sustained overload keeps reading as congestion.
+    """
+
+    def __init__(self, limit: int, min_limit: int = 1, max_limit: Optional[int] = None, adaptive: bool = False,
+                 tolerance: float = LATENCY_TOLERANCE, max_error_rate: float = MAX_ERROR_RATE,
+                 backoff: float = BACKOFF):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit or limit))
+        self.limit = float(min(max(int(limit), self.min_limit), self.max_limit))
+        self.adaptive = adaptive
+        self.tolerance, self.max_error_rate, self.backoff = tolerance, max_error_rate, backoff
+        self.in_flight = 0
+        self.baseline: Optional[float] = None
+        self.increases = self.decreases = 0
+        self._waiters: deque = deque()
+        self._n = self._errors = self._skip = 0
+        self._latency = 0.0
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self):
+        if self.in_flight < self.current and not self._waiters:
+            self.in_flight += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut  # the releasing side already counted us in
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                self._waiters.remove(fut)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+        return False
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.current:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+
+    def set(self, limit: Optional[int] = None, min_limit: Optional[int] = None, max_limit: Optional[int] = None,
+            adaptive: Optional[bool] = None):
+        # live adjustment; shrinking takes effect as running jobs finish
+        if min_limit is not None:
+            self.min_limit = max(1, int(min_limit))
+        if max_limit is not None:
+            self.max_limit = int(max_limit)
+        self.max_limit = max(self.max_limit, self.min_limit)
+        if adaptive is not None:
+            self.adaptive = adaptive
+            self.baseline = None
+        self.limit = float(min(max(int(limit) if limit is not None else self.limit, self.min_limit), self.max_limit))
+        self._n = self._errors = 0
+        self._latency = 0.0
+        self._wake()
+
+    def record(self, latency: float, ok: bool):
+        if not self.adaptive:
+            return
+        if self._skip:
+            # jobs admitted under the old, larger limit say nothing about the new one
+            self._skip -= 1
+            return
+        self._n += 1
+        if ok:
+            self._latency += latency
+        else:
+            self._errors += 1  # fast failures would drag the latency baseline down
+        if self._n < max(MIN_WINDOW, self.current):
+            return
+        error_rate = self._errors / self._n
+        mean = self._latency / (self._n - self._errors) if self._n > self._errors else None
+        self._n = self._errors = 0
+        self._latency = 0.0
+        if mean is not None:
+            if self.baseline is None or mean < self.baseline:
+                self.baseline = mean
+            else:
+                self.baseline += (mean - self.baseline) * 0.05
+        if error_rate > self.max_error_rate or (mean is not None and mean > self.baseline * self.tolerance):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self.decreases += 1
+            self._skip = self.in_flight
+        elif self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + max(1.0, self.limit ** 0.5))
+            self.increases += 1
+        self._wake()
+
+    def snapshot(self) -> dict:
+        return {"limit": self.current, "min": self.min_limit, "max": self.max_limit, "adaptive": self.adaptive,
+                "held": self.in_flight, "waiting": len(self._waiters),
+                "baseline_ms": round(self.baseline * 1000, 2) if self.baseline is not None else None,
+                "increases": self.increases, "decreases": self.decreases}
@@ -1,6 +1,16 @@
-import os, asyncio, argparse
-from fastapi import FastAPI
-from app.orchestrator import Orchestrator
+import os, time, asyncio, argparse
+from app.infra.services import services, import_timer, PREWARM
+with import_timer("fastapi"):
+    from fastapi import FastAPI, HTTPException, Request, Response
+    from fastapi.responses import StreamingResponse
+with import_timer("orchestrator"):
+    from app.orchestrator import Orchestrator, MODES
+    from app.fairqueue import parse_map, FAIR_KEY
+    from app import rollups
+    from app.broadcast import events
+    from app.models.plan import load_plan
+    from app.infra import aflush, completed_runs, metrics, artifacts, metric_store
+    from app.infra.leases import lease_store
 
 CSV_PATH = os.environ.get("QIL_CSV", "data/QIL_365_VOT_Metrics_Plan.csv")
 
@@ -8,38 +18,193 @@ app = FastAPI(title="QIL – VOT Orchestrator")
 
 orch: Orchestrator | None = None
 task = None
+_idle_rollups: rollups.Rollups | None = None  # served before the first /start
+
+@app.on_event("startup")
+async def _startup():
+    if PREWARM:
+        # in the background: the first request must not wait for it
+        asyncio.create_task(asyncio.to_thread(services.prewarm, PREWARM))
+    print(f"⏱  startup {services.summary()}")
+
+@app.get("/services")
+async def services_report():
+    # what startup imported, which services exist yet and what building them cost
+    return services.report()
+
+@app.post("/services/prewarm")
+async def services_prewarm(names: str | None = None):
+    wanted = [n.strip() for n in names.split(",") if n.strip()] if names else None
+    return await asyncio.to_thread(services.prewarm, wanted)
 
 @app.post("/start")
-async def start(concurrency: int = 32):
+async def start(concurrency: int = 32, mode: str = "full", distributed: bool = False, plan_id: str | None = None,
+                join: bool = False, adaptive: bool = False, min_concurrency: int = 1, max_concurrency: int | None = None,
+                fair: str = FAIR_KEY, weights: str | None = None, caps: str | None = None):
+    # weights / caps: "tenant=value,..." (default: QIL_TENANT_WEIGHTS / QIL_TENANT_CAPS)
     global orch, task
-    orch = Orchestrator(CSV_PATH, concurrency=concurrency)
-    orch.load()
+    if mode not in MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {MODES}")
+    try:
+        w = parse_map(weights) if weights is not None else None
+        c = parse_map(caps, int) if caps is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"bad weights/caps: {e}")
+    leases = lease_store() if distributed else None
+    o = Orchestrator(CSV_PATH, concurrency=concurrency, mode=mode, leases=leases, plan_id=plan_id,
+                     join=join, adaptive=adaptive, min_concurrency=min_concurrency, max_concurrency=max_concurrency,
+                     fair=fair, weights=w, caps=c)
+    try:
+        # CSV parse, fingerprints and the ledger query can take seconds on large plans
+        await asyncio.to_thread(o.load)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # only a loaded plan replaces what /status, /events and /rollups are showing
+    orch = o
     task = asyncio.create_task(orch.run())
-    return {"status": "started", "concurrency": concurrency}
+    return {"status": "started", "concurrency": orch.limiter.snapshot(), "mode": mode,
+            "plan_id": orch.plan_id, "owner": orch.owner if distributed else None, **orch.status_counts()}
 
 @app.get("/status")
 async def status():
     if orch:
-        return orch.status_counts()
+        return {**orch.status_counts(), "concurrency": orch.limiter.snapshot(), "jobs": dict(orch.job_stats),
+                "fairness": orch.fairness_report()}
     return {"total": 0, "done": 0, "open": 0}
 
+@app.get("/events")
+async def event_stream(request: Request):
+    # Server-Sent Events: started/finished/failed/blocked per job plus a tick (counts, ready queue,
+    # throughput) every interval; reconnecting clients resume from Last-Event-ID while it is still buffered
+    last = request.headers.get("last-event-id")
+    return StreamingResponse(events.stream(int(last) if last and last.isdigit() else None),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/concurrency")
+async def concurrency(limit: int | None = None, min: int | None = None, max: int | None = None,
+                      adaptive: bool | None = None):
+    # live adjustment of the worker limit; with no arguments just reports it
+    if not orch:
+        raise HTTPException(status_code=409, detail="orchestrator not started")
+    for name, v in (("limit", limit), ("min", min), ("max", max)):
+        if v is not None and v < 1:
+            raise HTTPException(status_code=400, detail=f"{name} must be >= 1")
+    lo = min if min is not None else orch.limiter.min_limit
+    hi = max if max is not None else orch.limiter.max_limit
+    if lo > hi:
+        raise HTTPException(status_code=400, detail=f"min {lo} is above max {hi}")
+    if limit is not None and not lo <= limit <= hi:
+        raise HTTPException(status_code=400, detail=f"limit {limit} is outside min {lo} / max {hi}; pass max= too")
+    return orch.set_concurrency(limit, min, max, adaptive)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/metrics/keys")
+async def metric_keys():
+    return {"keys": metric_store.keys()}
+
+@app.get("/metrics/query")
+async def metric_query(key: str, start: float | None = None, end: float | None = None, step: float | None = None,
+                       tier: str = "auto", day: int | None = None):
+    # start/end are epoch seconds; negative values count back from now (start=-86400 -> the last day)
+    now = time.time()
+    start = now + start if start is not None and start < 0 else start
+    end = now + end if end is not None and end < 0 else end
+    try:
+        return await asyncio.to_thread(metric_store.query, key, start, end, step, tier, day)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _rollups_from_ledger() -> rollups.Rollups:
+    # same history the dashboard's run.ok panels show, so a restart doesn't reset every day to open
+    plan = load_plan(CSV_PATH)
+    try:
+        succeeded = completed_runs()
+    except Exception as e:
+        print(f"⚠️ Rollups without ledger history: {e}")
+        succeeded = {}
+    return rollups.from_plan(plan, succeeded)
+
+@app.get("/rollups/{view}")
+async def rollup(view: str, request: Request):
+    # precomputed dashboard aggregates: throughput, heatmap, themes, graph
+    global _idle_rollups
+    if view not in rollups.VIEWS:
+        raise HTTPException(status_code=404, detail=f"view must be one of {rollups.VIEWS}")
+    if orch and orch.rollups:
+        r = orch.rollups
+    else:
+        if _idle_rollups is None:
+            try:
+                _idle_rollups = await asyncio.to_thread(_rollups_from_ledger)
+            except OSError:
+                raise HTTPException(status_code=404, detail="plan CSV not found")
+        r = _idle_rollups
+    etag, body = r.body(view)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if rollups.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/artifacts/resolve")
+async def resolve_artifact(ref: str):
+    # qilpack:// ref or artifact name -> pack URL + byte range
+    try:
+        return artifacts.resolve(ref)
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=404, detail="unknown artifact")
+
+@app.get("/behaviors")
+async def behaviors():
+    if orch:
+        return orch.behavior_report
+    return {"behaviors": {}, "errors": {}, "roles": {}}
+
 @app.post("/stop")
 async def stop():
     global orch, task
     if task:
         task.cancel()
-    return {"status": "stopping"}
+        await asyncio.gather(task, return_exceptions=True)
+    # uploads the cancelled jobs already handed off finish, then every run/metric row queued so far is on disk
+    await artifacts.aflush()
+    ok = await aflush()
+    return {"status": "stopped", "flushed": ok}
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--cli", action="store_true")
     parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", choices=MODES, default="full")
+    parser.add_argument("--distributed", action="store_true", help="share the plan with other instances via leases")
+    parser.add_argument("--plan-id", default=None, help="join this run instead of starting a new one")
+    parser.add_argument("--join", action="store_true", help="join the live run of the same CSV, if any")
+    parser.add_argument("--adaptive", action="store_true", help="let the worker limit follow latency and errors")
+    parser.add_argument("--min-concurrency", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=None, help="default: 4x --concurrency when adaptive")
+    parser.add_argument("--fair", default=FAIR_KEY, help="fair-queue tenants by theme, role or a plan column")
+    parser.add_argument("--tenant-weights", default=None, help='e.g. "Acme=4,Core Seed Ignition=1"')
+    parser.add_argument("--tenant-caps", default=None, help='max jobs in flight per tenant, e.g. "Acme=8"')
+    parser.add_argument("--bench", nargs=argparse.REMAINDER, metavar="ARGS",
+                        help="run app.bench with the remaining arguments (e.g. --bench dag --nodes 365 100000)")
     args = parser.parse_args()
-    if args.cli:
-        o = Orchestrator(CSV_PATH, concurrency=args.concurrency)
+    if args.bench is not None:
+        from app.bench import main as bench_main
+        bench_main(args.bench or ["dag"])
+    elif args.cli:
+        leases = lease_store() if args.distributed else None
+        o = Orchestrator(CSV_PATH, concurrency=args.concurrency, mode=args.mode, leases=leases, plan_id=args.plan_id,
+                         join=args.join, adaptive=args.adaptive, min_concurrency=args.min_concurrency,
+                         max_concurrency=args.max_concurrency, fair=args.fair,
+                         weights=parse_map(args.tenant_weights) if args.tenant_weights is not None else None,
+                         caps=parse_map(args.tenant_caps, int) if args.tenant_caps is not None else None)
         o.load()
         asyncio.run(o.run())
-        print(o.status_counts())
+        print({**o.status_counts(), "concurrency": o.limiter.snapshot(), "jobs": o.job_stats,
+               "fairness": o.fairness_report()})
     else:
         import uvicorn
         uvicorn.run("app.main:app", host="0.0.0.0", port=8080, reload=True)
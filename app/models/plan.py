@@ -0,0 +1,196 @@
+import os, sys, csv, pickle, hashlib
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from app.models.schema import VOT
+
+PLAN_CACHE_DIR = os.environ.get("QIL_PLAN_CACHE", ".qil_cache")
+SNAPSHOT_VERSION = 1
+
+# VOT field -> CSV header
+COLUMNS = {
+    "day": "Day",
+    "date": "Date",
+    "theme": "Theme",
+    "name": "VOT Name",
+    "deliverable": "Primary Deliverable",
+    "metrics_template": "Key Metrics (template)",
+    "status": "Status",
+}
+DEPS_COL = "Dependencies (Day #)"
+ROLE_SEP = " – "
+
+
+def parse_deps(raw: Optional[str]) -> set:
+    # "4, 8, 10" -> {4, 8, 10}; duplicates ("1, 1") and junk are dropped
+    return {int(x) for x in (raw or "").split(",") if x.strip().isdigit()}
+
+
+def fingerprint(row: dict) -> str:
+    # everything that defines the work; Status is bookkeeping, not input
+    h = hashlib.sha256()
+    for k in sorted(row):
+        if k != COLUMNS["status"]:
+            h.update(f"{k}\x1f{row[k]}\x1e".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Plan:
+    """Column-oriented plan table.
+
+    One list/array per `VOT` field instead of a dict per row; low-cardinality
+    columns (date, theme, role, status, metrics template) are interned so
+    each distinct value is stored once. Dependencies are kept CSR-style in
+    two int arrays. Rows are addressed by position; `pos` maps day -> position.
+    """
+
+    __slots__ = ("day", "date", "theme", "name", "role", "deliverable", "metrics_template", "status",
+                 "fingerprint", "dep_off", "dep_days", "extra", "pos",
+                 "by_role", "by_theme", "by_date", "by_status")
+
+    def __init__(self):
+        self.day = array("i")
+        self.date: List[str] = []
+        self.theme: List[str] = []
+        self.name: List[str] = []
+        self.role: List[str] = []
+        self.deliverable: List[str] = []
+        self.metrics_template: List[str] = []
+        self.status: List[str] = []
+        self.fingerprint: List[str] = []
+        self.dep_off = array("i", [0])
+        self.dep_days = array("i")
+        self.extra: Dict[str, List[str]] = {}  # columns beyond the known schema
+        self.pos: Dict[int, int] = {}
+        self.by_role: Dict[str, array] = {}
+        self.by_theme: Dict[str, array] = {}
+        self.by_date: Dict[str, array] = {}
+        self.by_status: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Plan":
+        plan = cls()
+        intern = sys.intern
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            known = set(COLUMNS.values()) | {DEPS_COL}
+            extra_cols = [h for h in reader.fieldnames or [] if h not in known]
+            plan.extra = {h: [] for h in extra_cols}
+            for r in reader:
+                day = int(r["Day"])
+                name = r.get("VOT Name") or ""
+                plan.pos[day] = len(plan.day)
+                plan.day.append(day)
+                plan.date.append(intern(r.get("Date") or ""))
+                plan.theme.append(intern(r.get("Theme") or ""))
+                plan.name.append(name)
+                plan.role.append(intern(name.split(ROLE_SEP)[0] or "generic"))
+                plan.deliverable.append(r.get("Primary Deliverable") or "")
+                plan.metrics_template.append(intern(r.get("Key Metrics (template)") or ""))
+                plan.status.append(intern(r.get("Status") or ""))
+                plan.fingerprint.append(fingerprint(r))
+                plan.dep_days.extend(sorted(parse_deps(r.get(DEPS_COL)) - {day}))
+                plan.dep_off.append(len(plan.dep_days))
+                for h in extra_cols:
+                    plan.extra[h].append(r.get(h) or "")
+        plan._index()
+        return plan
+
+    def _index(self):
+        for attr, col in (("by_role", self.role), ("by_theme", self.theme),
+                          ("by_date", self.date), ("by_status", self.status)):
+            idx: Dict[str, array] = {}
+            for i, v in enumerate(col):
+                idx.setdefault(v, array("i")).append(i)
+            setattr(self, attr, idx)
+
+    def deps(self, i: int) -> array:
+        return self.dep_days[self.dep_off[i]:self.dep_off[i + 1]]
+
+    def days_where(self, index: Dict[str, array], key: str) -> List[int]:
+        # e.g. plan.days_where(plan.by_theme, "Core Seed Ignition")
+        return [self.day[i] for i in index.get(key, ())]
+
+    def row(self, i: int) -> dict:
+        # the CSV-shaped dict behaviors receive
+        r = {
+            "Day": self.day[i],
+            "Date": self.date[i],
+            "Theme": self.theme[i],
+            "VOT Name": self.name[i],
+            "Primary Deliverable": self.deliverable[i],
+            "Key Metrics (template)": self.metrics_template[i],
+            "Status": self.status[i],
+            DEPS_COL: ", ".join(str(d) for d in self.deps(i)),
+        }
+        for h, col in self.extra.items():
+            r[h] = col[i]
+        return r
+
+    def vot(self, i: int) -> VOT:
+        return VOT(day=self.day[i], date=self.date[i], theme=self.theme[i], name=self.name[i],
+                   deliverable=self.deliverable[i], metrics_template=self.metrics_template[i],
+                   status=self.status[i] or "Open", deps=list(self.deps(i)))
+
+    def vots(self, positions: Optional[Iterable[int]] = None):
+        for i in positions if positions is not None else range(len(self)):
+            yield self.vot(i)
+
+
+def _snapshot_path(csv_path: str, cache_dir: str) -> str:
+    key = hashlib.sha1(os.path.abspath(csv_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{key}.plan")
+
+
+def load_plan(csv_path: str, cache_dir: Optional[str] = PLAN_CACHE_DIR) -> Plan:
+    """Parse `csv_path`, reusing a binary snapshot when the CSV is unchanged.
+
+    The snapshot header records the CSV's mtime, size and sha256: a matching
+    mtime+size skips hashing entirely, a matching hash (file touched but not
+    edited) still skips parsing.
+    """
+    if not cache_dir:
+        return Plan.from_csv(csv_path)
+    st = os.stat(csv_path)
+    snap = _snapshot_path(csv_path, cache_dir)
+    digest = None
+    try:
+        with open(snap, "rb") as f:
+            header = pickle.load(f)
+            if header.get("version") == SNAPSHOT_VERSION:
+                if header["mtime_ns"] == st.st_mtime_ns and header["size"] == st.st_size:
+                    return pickle.load(f)
+                digest = _sha256(csv_path)
+                if header["sha256"] == digest:
+                    plan = pickle.load(f)
+                    _write_snapshot(snap, st, digest, plan)
+                    return plan
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError):
+        pass
+    plan = Plan.from_csv(csv_path)
+    _write_snapshot(snap, st, digest or _sha256(csv_path), plan)
+    return plan
+
+
+def _write_snapshot(snap: str, st: os.stat_result, digest: str, plan: Plan):
+    header = {"version": SNAPSHOT_VERSION, "mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+    try:
+        os.makedirs(os.path.dirname(snap), exist_ok=True)
+        tmp = f"{snap}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(plan, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snap)
+    except OSError as e:
+        print(f"⚠️ Plan snapshot not written: {e}")
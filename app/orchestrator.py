@@ -1,28 +1,72 @@
 # app/orchestrator.py
 from __future__ import annotations
-from fastapi import FastAPI, Request, HTTPException
-from pydantic import BaseModel
 from typing import Optional
-import os, json
+import os, time, uuid, asyncio, hashlib
 from datetime import datetime
 from pathlib import Path
 
-# Optional Supabase (safe if libs missing)
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        from supabase import create_client
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    except Exception as e:
-        print(f"⚠️ Supabase init failed: {e}")
+from app.infra.services import services, import_timer, supabase_client, supabase_configured, PREWARM
+
+with import_timer("fastapi"):
+    from fastapi import FastAPI, Request, HTTPException
+    from pydantic import BaseModel, ValidationError
+with import_timer("scheduler"):
+    from app.worker import submit_job, history
+    from app.infra.inbox_log import InboxLog, Replicator
+    from app.infra.inbox_index import InboxIndex, RECONCILE_SECONDS
+    from app.infra.leases import new_owner, LEASE_TTL, LEASE_POLL
+    from app.registry import registry
+    from app.executors import process_runner
+    from app.limiter import ConcurrencyLimiter
+    from app.fairqueue import FairQueue, FAIR_KEY
+    from app.rollups import Rollups, RUNNING, DONE, FAILED, BLOCKED
+    from app.broadcast import events
+    from app.models.plan import Plan, load_plan
+    from app.infra import init_db, start_run, finish_run, add_metric, completed_runs, aflush, wait_room
+    from app.infra import metrics, artifacts
 
 QIL_SECRET = os.getenv("QIL_SECRET", "")
 INBOX_DIR = Path("data/inbox")
-INBOX_DIR.mkdir(parents=True, exist_ok=True)
+
+# built on first use (or by QIL_PREWARM at startup), not at import
+services.register("inbox", lambda: InboxLog(INBOX_DIR))
+services.register("replicator", lambda: Replicator(services.get("inbox"), supabase_client)
+                  if supabase_configured() else None)
+inbox_index = InboxIndex()
 
 app = FastAPI(title="Quantum Intelligence Lattice")
+_reconcile_task = None
+_prewarm_task = None
+
+async def _reconcile_loop():
+    while True:
+        await asyncio.sleep(RECONCILE_SECONDS)
+        try:
+            await asyncio.to_thread(inbox_index.reconcile, services.get("inbox"))
+        except Exception as e:
+            print(f"⚠️ Inbox reconcile failed: {e}")
+
+@app.on_event("startup")
+async def _start_inbox():
+    global _reconcile_task, _prewarm_task
+    await asyncio.to_thread(inbox_index.seed, services.get("inbox"), INBOX_DIR)
+    if RECONCILE_SECONDS > 0:
+        _reconcile_task = asyncio.create_task(_reconcile_loop())
+    replicator = services.get("replicator")
+    if replicator:
+        replicator.start()
+    if PREWARM:
+        _prewarm_task = asyncio.create_task(asyncio.to_thread(services.prewarm, PREWARM))
+    print(f"⏱  startup {services.summary()}")
+
+@app.on_event("shutdown")
+def _stop_inbox():
+    if _reconcile_task:
+        _reconcile_task.cancel()
+    if services.ready("inbox"):
+        services.get("inbox").flush(timeout=5)
+    if services.ready("replicator") and services.get("replicator"):
+        services.get("replicator").stop()
 
 class HookPayload(BaseModel):
     source: str
@@ -31,16 +75,13 @@ class HookPayload(BaseModel):
     timestamp: Optional[str] = None
     extra: Optional[dict] = None
 
-def _ts() -> str:
-    return datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-
 @app.get("/")
 def root():
     return {
         "ok": True,
         "service": "QIL",
         "message": "Listening for breaths and intents.",
-        "inbox_count": len(list(INBOX_DIR.glob("*.json"))),
+        "inbox_count": inbox_index.total,
     }
 
 @app.post("/hook")
@@ -50,24 +91,401 @@ async def hook(req: Request):
     if not QIL_SECRET or secret != QIL_SECRET:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    data = await req.json()
-    payload = HookPayload(**data)
+    try:
+        payload = HookPayload(**(await req.json()))
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid payload: {e}")
+
+    # Append to the inbox log; the writer thread group-commits and the
+    # replicator mirrors committed records to Supabase in batches
+    record = {**payload.dict(), "received_at": datetime.utcnow().isoformat() + "Z"}
+    offset = services.get("inbox").append(record)
+    inbox_index.add({**record, "offset": offset})
+    return {"ok": True, "stored": offset}
+
+@app.get("/inbox")
+def inbox_read(offset: int = 0, limit: int = 100):
+    inbox = services.get("inbox")
+    records = list(inbox.read(max(0, offset), max(1, min(limit, 1000))))
+    next_offset = records[-1]["offset"] + 1 if records else offset
+    return {"records": records, "next_offset": next_offset, "committed": inbox.committed}
+
+@app.get("/inbox/stats")
+def inbox_stats(latest: int = 10):
+    return {**inbox_index.counts(), "latest": inbox_index.latest(max(0, min(latest, 1000)))}
+
+@app.get("/inbox/range")
+def inbox_range(start: str = "", end: Optional[str] = None, limit: int = 1000):
+    return {"records": inbox_index.between(start, end, max(1, min(limit, 10000)))}
+
+################################################################################
+# VOT DAG scheduler
+
+MODES = ("full", "resume", "incremental")
+
+
+class Orchestrator:
+    """Runs the plan CSV as a DAG, critical-path first, on `concurrency` workers.
+
+    Ready VOTs sit in a priority queue ranked by the length of the longest
+    dependency chain still hanging off them, so the days that bound the
+    makespan are always dispatched before slack work.
+
+    `mode` decides what counts as already done:
+      - full: only rows whose CSV Status is Done
+      - resume: also every day with a successful run in the ledger
+      - incremental: days whose last successful run saw the same row
+        fingerprint, unless something upstream of them is re-running
+
+    With a lease store (see app/infra/leases.py) several orchestrators can
+    share one plan: a day is only executed after claiming its lease, days
+    finished elsewhere are picked up by polling, and leases whose owner
+    stopped heartbeating are re-queued. Each start is a new run (`plan_id`)
+    unless it names one or `join`s the live run of the same CSV content;
+    lease rows finished before this instance started count like ledger
+    history under `mode` (failed ones are always retried).
+
+    With `adaptive`, `concurrency` is only the starting point: the limiter
+    (app/limiter.py) moves the number of jobs in flight between
+    `min_concurrency` and `max_concurrency` from observed latency and
+    failures. `set_concurrency` adjusts it while the plan runs.
+
+    With `fair` ("theme", "role" or a CSV column such as "Tenant") the
+    ready set is split per tenant and drained by weighted fair queuing
+    (app/fairqueue.py): critical-path order within a tenant, `weights`
+    shares and `caps` on jobs in flight across them.
+    """
+
+    def __init__(self, csv_path: str, concurrency: int = 16, mode: str = "full",
+                 leases=None, plan_id: Optional[str] = None, join: bool = False, adaptive: bool = False,
+                 min_concurrency: int = 1, max_concurrency: Optional[int] = None, fair: str = FAIR_KEY,
+                 weights: Optional[dict] = None, caps: Optional[dict] = None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.csv_path = csv_path
+        self.concurrency = max(1, int(concurrency))
+        if max_concurrency is None:
+            max_concurrency = self.concurrency * 4 if adaptive else self.concurrency
+        self.limiter = ConcurrencyLimiter(self.concurrency, min_concurrency, max_concurrency, adaptive)
+        self._workers: list[asyncio.Task] = []
+        self.fair = fair
+        self.weights, self.caps = weights, caps
+        self._tenant_of = lambda day: "*"
+        self.mode = mode
+        self.leases = leases
+        self.plan_id = plan_id
+        self.join = join
+        self.owner = new_owner()
+        self.fingerprints: dict[int, str] = {}
+        self.plan: Optional[Plan] = None
+        self.deps: dict[int, list[int]] = {}
+        self.children: dict[int, list[int]] = {}
+        self.rank: dict[int, int] = {}
+        self.critical_path = 0
+        self.behavior_report: dict = {}
+        self.rollups: Optional[Rollups] = None
+        self.events = events
+        self._uses_processes = False
+        self._indeg: dict[int, int] = {}
+        self._done: set[int] = set()
+        self._blocked: set[int] = set()
+        self._failed: set[int] = set()
+        self._running: set[int] = set()
+        self._remote: set[int] = set()  # leased by another instance
+        self._since = 0.0
+        self._started = 0.0
+        self._remaining = 0
+        self._ready: Optional[FairQueue] = None
+        self._finished: Optional[asyncio.Event] = None
+        self._counts = {"total": 0, "done": 0, "open": 0, "in_progress": 0, "failed": 0, "blocked": 0, "remote": 0}
+        self.job_stats = {"timeouts": 0, "hedged": 0, "hedge_wins": 0}
+
+    def load(self):
+        plan = load_plan(self.csv_path)
+        rows = plan.pos
+        deps = {d: [p for p in plan.deps(i) if p in rows] for d, i in rows.items()}
+        children: dict[int, list[int]] = {d: [] for d in rows}
+        for d, ds in deps.items():
+            for p in ds:
+                children[p].append(d)
+
+        # Kahn's algorithm for a topological order (and cycle detection)
+        indeg = {d: len(ds) for d, ds in deps.items()}
+        order = [d for d, n in indeg.items() if n == 0]
+        pending = dict(indeg)
+        for d in order:
+            for c in children[d]:
+                pending[c] -= 1
+                if pending[c] == 0:
+                    order.append(c)
+        if len(order) != len(rows):
+            cyclic = sorted(d for d, n in pending.items() if n > 0)
+            raise ValueError(f"dependency cycle among days {cyclic[:10]}")
+
+        # rank = number of VOTs on the longest path starting at this day
+        rank: dict[int, int] = {}
+        for d in reversed(order):
+            rank[d] = 1 + max((rank[c] for c in children[d]), default=0)
+
+        fingerprints = {d: plan.fingerprint[i] for d, i in rows.items()}
+        done = {plan.day[i] for status, idx in plan.by_status.items()
+                if status.strip().lower() == "done" for i in idx}
+        ledger = completed_runs()
+        if self.mode == "resume":
+            done |= ledger.keys() & rows.keys()
+        elif self.mode == "incremental":
+            for d in order:
+                if d in done:
+                    continue
+                fresh = ledger.get(d) == fingerprints[d]
+                if fresh and all(p in done for p in deps[d]):
+                    done.add(d)
+        for d in done:
+            for c in children[d]:
+                indeg[c] -= 1
+
+        self.plan, self.deps, self.children, self.rank = plan, deps, children, rank
+        self.fingerprints = fingerprints
+        self._tenant_of = self._tenant_key(plan)
+        # the dashboard starts from the ledger's successes too; days this run re-executes move on from there
+        self.rollups = Rollups(plan, done | (ledger.keys() & rows.keys()))
+        self.critical_path = max(rank.values(), default=0)
+        self._indeg, self._done, self._blocked, self._failed = indeg, done, set(), set()
+        self._running, self._remote, self._since = set(), set(), 0.0
+        self._remaining = len(rows) - len(done)
+        self._counts = {"total": len(rows), "done": len(done), "open": self._remaining,
+                        "in_progress": 0, "failed": 0, "blocked": 0, "remote": 0}
+        if self.leases is not None:
+            self._started = time.time()
+            if self.plan_id is None:
+                # a fresh run per start, tagged with the plan content so `join` can find it
+                base = hashlib.sha256("".join(plan.fingerprint).encode()).hexdigest()[:16]
+                live = self.leases.live_plan(base) if self.join else None
+                self.plan_id = live or f"{base}-{uuid.uuid4().hex[:8]}"
+        # resolve every role once up front so the per-job path is a dict hit
+        registry.load()
+        self.behavior_report = registry.report(plan.by_role)
+        self._uses_processes = any(registry.modes[registry.resolve(r)[0]] == "process" for r in plan.by_role)
+        return self
+
+    def _tenant_key(self, plan: Plan):
+        if not self.fair:
+            return lambda day: "*"
+        if self.fair in ("theme", "role"):
+            col = getattr(plan, self.fair)
+        elif self.fair in plan.extra:
+            col = plan.extra[self.fair]
+        else:
+            raise ValueError(f"fair key {self.fair!r} is neither theme, role nor a plan column")
+        pos = plan.pos
+        return lambda day: col[pos[day]] or "-"
+
+    def status_counts(self) -> dict:
+        return dict(self._counts)
+
+    def stream_state(self) -> dict:
+        # what every /events tick and snapshot carries
+        return {**self._counts, "ready": self._ready.qsize() if self._ready else 0,
+                "concurrency": self.limiter.current}
+
+    def fairness_report(self) -> dict:
+        if self._ready is None:
+            return {"key": self.fair or None, "tenants": {}, "jain_index": None}
+        return {"key": self.fair or None, **self._ready.report()}
+
+    def set_concurrency(self, limit: Optional[int] = None, min_limit: Optional[int] = None,
+                        max_limit: Optional[int] = None, adaptive: Optional[bool] = None) -> dict:
+        self.limiter.set(limit, min_limit, max_limit, adaptive)
+        if self._workers:
+            self._spawn_workers()
+        return self.limiter.snapshot()
+
+    def _spawn_workers(self):
+        # one task per slot the limiter may ever hand out; idle ones just wait on it
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.limiter.max_limit:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def run(self):
+        init_db()
+        if self._uses_processes:
+            # fork the pool before the first process-mode job needs it
+            await asyncio.to_thread(process_runner.start, {"csv_path": self.csv_path, "mode": self.mode})
+        self._ready = FairQueue(self._tenant_of, self.weights, self.caps)
+        self._finished = asyncio.Event()
+        metrics.QUEUE_DEPTH.labels().set_function(self._ready.qsize)
+        metrics.IN_FLIGHT.labels().set_function(lambda: self._counts["in_progress"])
+        metrics.CONCURRENCY_LIMIT.labels().set_function(lambda: self.limiter.current)
+        self.events.state = self.stream_state
+        for d, n in self._indeg.items():
+            if n == 0 and d not in self._done:
+                self._ready.put_nowait((-self.rank[d], d))
+        if self.leases is not None:
+            await self._sync()
+        if self._remaining == 0:
+            return
+        self._spawn_workers()
+        loops = []
+        if self.leases is not None:
+            loops = [asyncio.create_task(self._sync_loop()), asyncio.create_task(self._heartbeat_loop())]
+        try:
+            await self._finished.wait()
+        finally:
+            tasks, self._workers = self._workers + loops, []
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await artifacts.aflush()
+            await aflush()
+            await asyncio.to_thread(history.save)
+            self.events.publish("run_finished", **self._counts)
+
+    def _settled(self, day: int) -> bool:
+        return day in self._done or day in self._failed or day in self._blocked
+
+    async def _worker(self):
+        while True:
+            async with self.limiter:
+                await self._next_job()
+
+    async def _next_job(self):
+        _, day = await self._ready.get()
+        try:
+            await self._run_day(day)
+        finally:
+            self._ready.release(day)  # frees the tenant's slot under its cap
+
+    async def _run_day(self, day: int):
+        if self._settled(day) or day in self._running or day in self._remote:
+            return  # finished by another instance while it sat in the queue
+        if self.leases is not None and not await self._claim(day):
+            return
+        self._counts["open"] -= 1
+        self._counts["in_progress"] += 1
+        self._running.add(day)
+        self.rollups.set(day, RUNNING)
+        self.events.publish("started", day=day)
+        t0 = time.perf_counter()
+        ok = await self._execute(day)
+        spent = time.perf_counter() - t0
+        self.limiter.record(spent, ok)
+        self.events.publish("finished" if ok else "failed", day=day, seconds=round(spent, 4))
+        if self.leases is not None:
+            try:
+                await asyncio.to_thread(self.leases.complete, self.plan_id, day, self.owner, ok)
+            except Exception as e:
+                print(f"⚠️ Day {day} lease completion failed: {e}")
+        self._running.discard(day)
+        self._counts["in_progress"] -= 1
+        self._settle(day, ok)
+        if self._remaining == 0:
+            self._finished.set()
+
+    async def _claim(self, day: int) -> bool:
+        try:
+            if await asyncio.to_thread(self.leases.claim, self.plan_id, day, self.owner, LEASE_TTL,
+                                       self._started, self.mode == "full"):
+                return True
+        except Exception as e:
+            print(f"⚠️ Day {day} lease claim failed: {e}")
+            await asyncio.sleep(LEASE_POLL)
+            self._ready.put_nowait((-self.rank[day], day))
+            return False
+        self._remote.add(day)
+        self._counts["open"] -= 1
+        self._counts["remote"] += 1
+        return False
+
+    async def _sync(self):
+        # adopt results from other instances and take back abandoned leases
+        rows = await asyncio.to_thread(self.leases.finished_since, self.plan_id, self._since)
+        newest = self._since
+        for day, state, updated_at in rows:
+            newest = max(newest, updated_at)
+            if day not in self.children or self._settled(day) or day in self._running:
+                continue
+            if updated_at < self._started and (state == "failed" or self.mode == "full"):
+                continue  # history this run may claim again (see SqliteLeaseStore)
+            if day in self._remote:
+                self._remote.discard(day)
+                self._counts["remote"] -= 1
+            else:
+                self._counts["open"] -= 1
+            self._settle(day, state == "done")
+        # overlap the window a little so clock skew between hosts can't hide a row
+        self._since = max(self._since, newest - 2 * LEASE_POLL)
+        if self._remote:
+            for day in await asyncio.to_thread(self.leases.expired, self.plan_id):
+                if day in self._remote:
+                    self._remote.discard(day)
+                    self._counts["remote"] -= 1
+                    self._counts["open"] += 1
+                    self._ready.put_nowait((-self.rank[day], day))
+        if self._remaining == 0:
+            self._finished.set()
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(LEASE_POLL)
+            try:
+                await self._sync()
+            except Exception as e:
+                print(f"⚠️ Lease sync failed: {e}")
 
-    # Persist locally
-    path = INBOX_DIR / f"{payload.source}-{_ts()}.json"
-    path.write_text(json.dumps(payload.dict(), indent=2), encoding="utf-8")
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(LEASE_TTL / 3)
+            try:
+                await asyncio.to_thread(self.leases.heartbeat, self.plan_id, self.owner, list(self._running), LEASE_TTL)
+            except Exception as e:
+                print(f"⚠️ Lease heartbeat failed: {e}")
 
-    # Optional: mirror to Supabase
-    if supabase:
+    async def _execute(self, day: int) -> bool:
+        pos = self.plan.pos[day]
+        db = metrics.for_role(self.plan.role[pos]).db
         try:
-            supabase.table("qil_inbox").insert({
-                "source": payload.source,
-                "status": payload.status,
-                "file": payload.file,
-                "timestamp": payload.timestamp or datetime.utcnow().isoformat() + "Z",
-                "extra": payload.extra or {},
-            }).execute()
+            await wait_room()
+            t0 = time.perf_counter()
+            rid = start_run(day, self.fingerprints[day])
+            spent = time.perf_counter() - t0
+            ok, result = await submit_job(self.plan.row(pos), {"run_id": rid, "day": day}, self.job_stats)
+            t0 = time.perf_counter()
+            artifacts = {k: v for k, v in result.items() if isinstance(v, str)}
+            finish_run(rid, ok, artifacts)
+            for k, v in result.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    add_metric(day, k, float(v))
+            db.observe(spent + time.perf_counter() - t0)
+            return ok
         except Exception as e:
-            print(f"⚠️ Supabase insert failed: {e}")
+            print(f"⚠️ Day {day} ledger error: {e}")
+            return False
 
-    return {"ok": True, "stored": str(path)}
\ No newline at end of file
+    def _settle(self, day: int, ok: bool):
+        self._remaining -= 1
+        self.rollups.set(day, DONE if ok else FAILED)
+        if ok:
+            self._done.add(day)
+            self._counts["done"] += 1
+            for c in self.children[day]:
+                self._indeg[c] -= 1
+                if self._indeg[c] == 0:
+                    self._ready.put_nowait((-self.rank[c], c))
+            return
+        self._failed.add(day)
+        self._counts["failed"] += 1
+        # everything downstream of a failed day can never become ready
+        stack, newly = list(self.children[day]), 0
+        while stack:
+            c = stack.pop()
+            if self._settled(c):
+                continue
+            self._blocked.add(c)
+            self.rollups.set(c, BLOCKED)
+            newly += 1
+            stack.extend(self.children[c])
+        if newly:
+            self.events.publish("blocked", day=day, count=newly)
+        self._remaining -= newly
+        self._counts["open"] -= newly
+        self._counts["blocked"] += newly
@@ -0,0 +1,147 @@
+import os, inspect, importlib, importlib.util
+from importlib import metadata
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from app.executors import MODES, as_coroutine
+
+Behavior = Callable[[dict, dict], Awaitable[dict]]
+
+BEHAVIORS_DIR = Path(__file__).parent / "behaviors"
+ENTRY_POINT_GROUP = "qil.behaviors"
+# extra plugin directories, os.pathsep-separated (e.g. "/srv/qil/plugins:./local_behaviors")
+PLUGIN_DIRS = os.environ.get("QIL_BEHAVIOR_DIRS", "")
+FALLBACK = "generic"
+
+
+def role_key(role: str) -> str:
+    # "Codex Herald" -> "codex_herald"
+    return role.strip().lower().replace(" ", "_")
+
+
+def role_of(vot_name: str) -> str:
+    # 'Codex Herald – Day 1' -> 'Codex Herald'
+    return vot_name.split(" – ")[0] or FALLBACK
+
+
+class BehaviorRegistry:
+    """Role -> `run` coroutine table, built once and looked up per job."""
+
+    def __init__(self):
+        self.behaviors: Dict[str, Behavior] = {}
+        self.sources: Dict[str, str] = {}
+        self.modes: Dict[str, str] = {}
+        self.errors: Dict[str, str] = {}
+        # optional module-level TIMEOUT (seconds) and IDEMPOTENT (safe to hedge) declarations
+        self.timeouts: Dict[str, float] = {}
+        self.idempotent: Dict[str, bool] = {}
+        self._resolved: Dict[str, Tuple[str, Behavior]] = {}
+        self.loaded = False
+
+    def load(self, plugin_dirs: Iterable[str] = (), entry_points: bool = True, reload: bool = False):
+        if self.loaded and not reload:
+            return self
+        self.behaviors, self.sources, self.modes, self.errors, self._resolved = {}, {}, {}, {}, {}
+        self.timeouts, self.idempotent = {}, {}
+
+        # built-ins first; directory plugins and entry points may override them
+        for path in sorted(BEHAVIORS_DIR.glob("*.py")):
+            if path.stem.startswith("_"):
+                continue
+            self._add_module(path.stem, f"app.behaviors.{path.stem}")
+
+        dirs = [d for d in PLUGIN_DIRS.split(os.pathsep) if d] + list(plugin_dirs)
+        for d in dirs:
+            for path in sorted(Path(d).glob("*.py")):
+                if not path.stem.startswith("_"):
+                    self._add_file(path)
+
+        if entry_points:
+            for ep in metadata.entry_points(group=ENTRY_POINT_GROUP):
+                try:
+                    obj = ep.load()
+                except Exception as e:
+                    self.errors[ep.name] = f"entry point {ep.value}: {e}"
+                    continue
+                fn = getattr(obj, "run", obj)
+                spec = ep.value if ":" in ep.value else f"{ep.value}:run"
+                self._register(role_key(ep.name), fn, f"entry point {ep.value}", getattr(obj, "MODE", "async"), spec,
+                               getattr(obj, "TIMEOUT", None), getattr(obj, "IDEMPOTENT", False))
+
+        if FALLBACK not in self.behaviors:
+            raise RuntimeError(f"fallback behavior '{FALLBACK}' failed to load: {self.errors.get(FALLBACK)}")
+        self.loaded = True
+        return self
+
+    def _add_module(self, key: str, module_name: str):
+        try:
+            mod = importlib.import_module(module_name)
+        except Exception as e:
+            self.errors[key] = f"{module_name}: {e}"
+            return
+        self._register(key, getattr(mod, "run", None), module_name, getattr(mod, "MODE", "async"), f"{module_name}:run",
+                       getattr(mod, "TIMEOUT", None), getattr(mod, "IDEMPOTENT", False))
+
+    def _add_file(self, path: Path):
+        key = path.stem
+        try:
+            spec = importlib.util.spec_from_file_location(f"qil_plugin_{key}", path)
+            mod = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(mod)
+        except Exception as e:
+            self.errors[key] = f"{path}: {e}"
+            return
+        self._register(key, getattr(mod, "run", None), str(path), getattr(mod, "MODE", "async"), f"{path}:run",
+                       getattr(mod, "TIMEOUT", None), getattr(mod, "IDEMPOTENT", False))
+
+    def register(self, key: str, fn: Behavior, source: str, mode: str = "async", spec: str = "",
+                 timeout: Optional[float] = None, idempotent: bool = False):
+        # programmatic registration (benchmarks, embedding); takes effect for new lookups
+        self.load()
+        self._register(role_key(key), fn, source, mode, spec, timeout, idempotent)
+        self._resolved = {}
+        if role_key(key) in self.errors:
+            raise ValueError(self.errors[role_key(key)])
+
+    def _register(self, key: str, fn: Optional[Behavior], source: str, mode: str = "async", spec: str = "",
+                  timeout: Optional[float] = None, idempotent: bool = False):
+        # async behaviors run on the loop; thread/process ones may also be plain functions
+        if mode not in MODES:
+            self.errors[key] = f"{source}: unknown MODE {mode!r}, expected one of {MODES}"
+            return
+        if not (inspect.iscoroutinefunction(fn) or (mode != "async" and callable(fn))):
+            self.errors[key] = f"{source}: `run` is missing or not an async function"
+            return
+        self.behaviors[key] = as_coroutine(fn, mode, spec)
+        self.sources[key] = source
+        self.modes[key] = mode
+        self.errors.pop(key, None)
+        self.timeouts.pop(key, None)
+        if timeout:
+            self.timeouts[key] = float(timeout)
+        self.idempotent[key] = bool(idempotent)
+
+    def resolve(self, vot_name: str) -> Tuple[str, Behavior]:
+        role = role_of(vot_name)
+        hit = self._resolved.get(role)
+        if hit is None:
+            if not self.loaded:
+                self.load()
+            key = role_key(role)
+            if key not in self.behaviors:
+                key = FALLBACK
+            hit = self._resolved[role] = (key, self.behaviors[key])
+        return hit
+
+    def report(self, roles: Iterable[str] = ()) -> dict:
+        # warm-up report: which plan role runs which plugin
+        resolved = {}
+        for role in sorted(set(roles)):
+            key, _ = self.resolve(role)
+            resolved[role] = self.sources[key] if key == role_key(role) else f"{self.sources[key]} (fallback)"
+        return {"behaviors": dict(self.sources), "modes": dict(self.modes), "timeouts": dict(self.timeouts),
+                "idempotent": sorted(k for k, v in self.idempotent.items() if v), "errors": dict(self.errors),
+                "roles": resolved}
+
+
+registry = BehaviorRegistry()
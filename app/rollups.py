@@ -0,0 +1,126 @@
+import os, json, time, uuid
+from collections import deque
+from itertools import accumulate
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.models.plan import Plan
+
+STATUS = ("open", "running", "done", "failed", "blocked")
+OPEN, RUNNING, DONE, FAILED, BLOCKED = range(len(STATUS))
+# cytoscape classes the dashboard graph styles (done days are "ok" there)
+CLASSES = ("open", "running", "ok", "failed", "blocked")
+TIMELINE_BUCKET = 60  # seconds per throughput point
+TIMELINE_POINTS = 1440
+# a view changed since its last render is re-rendered at most this often; until then the older body
+# (with its own ETag) is served, so a busy run costs one O(N) render per view per interval, not per request
+RENDER_SECONDS = float(os.environ.get("QIL_ROLLUP_RENDER_SECONDS", "1.0"))
+_IS_DONE = bytes(int(code == DONE) for code in range(256))  # status code -> 1 if done
+
+
+class Rollups:
+    """Dashboard aggregates kept up to date as days change status.
+
+    Per-day status codes, per-theme status counts and a done-per-minute
+    timeline are adjusted in O(1) on each `set`. The JSON body of a view is
+    rendered only after something changed, and at most once per
+    `render_seconds`, so during a run a view lags the scheduler by at most
+    that long. Every body carries the ETag of the version it was rendered
+    from, so unchanged dashboards get a 304.
+    """
+
+    def __init__(self, plan: Plan, done: Iterable[int] = (), render_seconds: float = RENDER_SECONDS):
+        self.plan = plan
+        self.status = bytearray(len(plan))  # by plan position, all OPEN
+        names = sorted(plan.by_theme)
+        self.themes = [t or "Unknown" for t in names]
+        self._theme_of = bytearray(len(plan)) if len(names) < 256 else [0] * len(plan)
+        for k, t in enumerate(names):
+            for i in plan.by_theme[t]:
+                self._theme_of[i] = k
+        self.counts = [[0] * len(STATUS) for _ in names]
+        for k, t in enumerate(names):
+            self.counts[k][OPEN] = len(plan.by_theme[t])
+        self.totals = [0] * len(STATUS)
+        self.totals[OPEN] = len(plan)
+        self.timeline: deque = deque(maxlen=TIMELINE_POINTS)  # [bucket start, cumulative done]
+        self.version = 0
+        self._epoch = uuid.uuid4().hex[:8]
+        self.render_seconds = render_seconds
+        self._bodies: Dict[str, Tuple[int, float, str, bytes]] = {}  # view -> (version, rendered at, etag, body)
+        self._edges: Optional[list] = None  # the DAG itself never changes
+        for d in done:
+            self.set(d, DONE)
+
+    def set(self, day: int, code: int):
+        i = self.plan.pos.get(day)
+        if i is None or self.status[i] == code:
+            return
+        old = self.status[i]
+        self.status[i] = code
+        c = self.counts[self._theme_of[i]]
+        c[old] -= 1
+        c[code] += 1
+        self.totals[old] -= 1
+        self.totals[code] += 1
+        if code == DONE or old == DONE:
+            bucket = int(time.time()) // TIMELINE_BUCKET * TIMELINE_BUCKET
+            if self.timeline and self.timeline[-1][0] == bucket:
+                self.timeline[-1][1] = self.totals[DONE]
+            else:
+                self.timeline.append([bucket, self.totals[DONE]])
+        self.version += 1
+
+    def body(self, view: str) -> Tuple[str, bytes]:
+        # -> (etag, body) of the latest render
+        hit = self._bodies.get(view)
+        now = time.monotonic()
+        if hit is None or hit[0] != self.version and now - hit[1] >= self.render_seconds:
+            version = self.version
+            data = getattr(self, f"_{view}")()
+            hit = self._bodies[view] = (version, now, f'"{self._epoch}-{version}"',
+                                        json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        return hit[2], hit[3]
+
+    def _throughput(self) -> dict:
+        # cumulative done in plan order (the dashboard's x axis) plus done over wall-clock time
+        cum = list(accumulate(self.status.translate(_IS_DONE)))
+        return {"days": list(self.plan.day), "cumulative_done": cum,
+                "timeline": [list(p) for p in self.timeline], "bucket_seconds": TIMELINE_BUCKET}
+
+    def _heatmap(self) -> dict:
+        return {"status": STATUS, "days": list(self.plan.day), "codes": list(self.status),
+                "totals": dict(zip(STATUS, self.totals))}
+
+    def _themes(self) -> dict:
+        out = {}
+        for name, c in zip(self.themes, self.counts):
+            total = sum(c)
+            out[name] = {**dict(zip(STATUS, c)), "total": total,
+                         "pct_done": round(100 * c[DONE] / total, 1) if total else 0.0}
+        return {"status": STATUS, "themes": out}
+
+    def _graph(self) -> dict:
+        # cytoscape element definitions, ready to hand to the layout
+        plan = self.plan
+        nodes = [{"data": {"id": f"n{d}", "label": str(d)}, "classes": CLASSES[s]}
+                 for d, s in zip(plan.day, self.status)]
+        if self._edges is None:
+            self._edges = [{"data": {"id": f"e{p}_{d}", "source": f"n{p}", "target": f"n{d}"}}
+                           for i, d in enumerate(plan.day) for p in plan.deps(i) if p in plan.pos]
+        return {"nodes": nodes, "edges": self._edges}
+
+
+VIEWS = ("throughput", "heatmap", "themes", "graph")
+
+
+def from_plan(plan: Plan, succeeded: Iterable[int] = ()) -> Rollups:
+    # before any run: the CSV's own Done rows plus days with a successful run in the ledger
+    done = {plan.day[i] for status, idx in plan.by_status.items() if status.strip().lower() == "done" for i in idx}
+    return Rollups(plan, done | (set(succeeded) & plan.pos.keys()))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or etag in tags
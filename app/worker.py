@@ -1,16 +1,167 @@
-import importlib, os
+import os, json, time, asyncio
+from collections import deque
+from typing import Dict, Optional
 
-async def submit_job(vot_row: dict, ctx: dict) -> (bool, dict):
-    # vot_row['VOT Name'] is like 'Codex Herald – Day 1'
-    role = vot_row.get("VOT Name", "").split(" – ")[0] or "generic"
-    module_name = role.lower().replace(" ", "_")
+from app.registry import registry, role_of, role_key
+from app.infra import metrics
+from app.infra.artifacts import attempt
+
+# seconds before a job is cancelled; 0 = no deadline. Per role: module-level TIMEOUT or
+# QIL_ROLE_TIMEOUTS="codex_herald=30,generic=10" (role keys), which wins over both.
+JOB_TIMEOUT = float(os.environ.get("QIL_JOB_TIMEOUT", "0"))
+ROLE_TIMEOUTS = {k.strip(): float(v) for k, _, v in
+                 (p.partition("=") for p in os.environ.get("QIL_ROLE_TIMEOUTS", "").split(",") if "=" in p)}
+# IDEMPOTENT roles get a second attempt once a job runs past this latency percentile; 0 = never
+HEDGE_PERCENTILE = float(os.environ.get("QIL_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_HISTORY = os.environ.get("QIL_LATENCY_HISTORY", os.path.join(".qil_cache", "latency.json"))
+
+
+class LatencyHistory:
+    """Recent successful job latencies per role, kept across runs in a small JSON file."""
+
+    def __init__(self, path: Optional[str] = LATENCY_HISTORY, size: int = 512):
+        self.path = path
+        self.size = size
+        self.samples: Dict[str, deque] = {}
+        self._adds: Dict[str, int] = {}
+        self._cache: Dict[tuple, tuple] = {}
+        self._loaded = False
+
+    def load(self):
+        if self._loaded:
+            return self
+        self._loaded = True
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    for role, xs in json.load(f).items():
+                        self.samples[role] = deque(xs[-self.size:], maxlen=self.size)
+            except (OSError, ValueError):
+                pass
+        return self
+
+    def save(self):
+        if not self.path or not self.samples:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({r: [round(x, 4) for x in xs] for r, xs in self.samples.items()}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Latency history not saved: {e}")
+
+    def add(self, role: str, seconds: float):
+        if not self._loaded:
+            self.load()
+        xs = self.samples.get(role)
+        if xs is None:
+            xs = self.samples[role] = deque(maxlen=self.size)
+        xs.append(seconds)
+        self._adds[role] = self._adds.get(role, 0) + 1
+
+    def percentile(self, role: str, q: float) -> Optional[float]:
+        xs = self.samples.get(role)
+        if not xs or len(xs) < HEDGE_MIN_SAMPLES:
+            return None
+        # re-sort only every 32 new samples; the threshold doesn't need to be exact
+        adds = self._adds.get(role, 0)
+        hit = self._cache.get((role, q))
+        if hit is None or adds - hit[0] >= 32:
+            ordered = sorted(xs)
+            hit = self._cache[(role, q)] = (adds, ordered[min(len(ordered) - 1, int(q * len(ordered)))])
+        return hit[1]
+
+
+history = LatencyHistory()
+
+
+def deadline_for(role: str, key: str) -> float:
+    rk = role_key(role)
+    if rk in ROLE_TIMEOUTS:
+        return ROLE_TIMEOUTS[rk]
+    return registry.timeouts.get(key, JOB_TIMEOUT)
+
+
+def _reap(t: asyncio.Task):
+    # a cancelled loser that still failed must not log "exception was never retrieved"
+    if not t.cancelled():
+        t.exception()
+
+
+async def _guarded(run, vot_row: dict, ctx: dict, timeout: float, hedge_after: Optional[float],
+                   stats: dict, m: metrics.RoleMetrics):
+    # first successful attempt wins; everything still running at the end is cancelled
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + timeout if timeout else None
+    hedge_at = start + hedge_after if hedge_after is not None else None
+    first = asyncio.ensure_future(run(vot_row, ctx))
+    attempts, pending, error = [first], {first}, None
     try:
-        mod = importlib.import_module(f"app.behaviors.{module_name}")
-    except Exception:
-        # fallback to generic behavior
-        mod = importlib.import_module("app.behaviors.generic")
+        while True:
+            until = min((t for t in (deadline, hedge_at) if t is not None), default=None)
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED,
+                                               timeout=None if until is None else max(0.0, until - loop.time()))
+            for t in done:
+                if t.exception() is None:
+                    if t is not first:
+                        stats["hedge_wins"] += 1
+                        m.hedge_wins.inc()
+                    return t.result()
+                error = t.exception()
+            if not pending:
+                raise error
+            now = loop.time()
+            if deadline is not None and now >= deadline:
+                stats["timeouts"] += 1
+                m.timeouts.inc()
+                raise TimeoutError(f"deadline of {timeout:g}s exceeded")
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                stats["hedged"] += 1
+                m.hedged.inc()
+                # the task copies the context here, so only the hedge's saves see the tag
+                token = attempt.set("hedge")
+                try:
+                    hedge = asyncio.ensure_future(run(vot_row, {**ctx, "hedge": True}))
+                finally:
+                    attempt.reset(token)
+                attempts.append(hedge)
+                pending.add(hedge)
+    finally:
+        for t in attempts:
+            if not t.done():
+                t.cancel()
+            t.add_done_callback(_reap)
+
+
+async def submit_job(vot_row: dict, ctx: dict, stats: Optional[dict] = None) -> (bool, dict):
+    # vot_row['VOT Name'] is like 'Codex Herald – Day 1'; unknown roles map to generic
+    name = vot_row.get("VOT Name", "")
+    key, run = registry.resolve(name)
+    role = role_of(name)
+    m = metrics.for_role(role)
+    timeout = deadline_for(role, key)
+    hedge_after = None
+    if HEDGE_PERCENTILE and registry.idempotent.get(key):
+        hedge_after = history.load().percentile(role, HEDGE_PERCENTILE)
+    token = metrics.current.set(m)
+    t0 = time.perf_counter()
     try:
-        metrics = await mod.run(vot_row, ctx)
-        return True, metrics or {}
+        if timeout or hedge_after is not None:
+            out = await _guarded(run, vot_row, ctx, timeout, hedge_after,
+                                 stats if stats is not None else {"timeouts": 0, "hedged": 0, "hedge_wins": 0}, m)
+        else:
+            out = await run(vot_row, ctx)
+        m.ok.inc()
+        history.add(role, time.perf_counter() - t0)
+        return True, out or {}
     except Exception as e:
-        return False, {"error": str(e)}
+        m.failed.inc()
+        return False, {"error": str(e) or type(e).__name__}
+    finally:
+        m.exec.observe(time.perf_counter() - t0)
+        metrics.current.reset(token)
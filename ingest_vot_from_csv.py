@@ -1,30 +1,23 @@
-import os, csv, argparse
+import argparse
 from supabase import create_client
+from app.infra.bulk_load import DIFF_MODES, BATCH, INFLIGHT, load_csv, print_summary
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--csv", required=True, help="Path to QIL_365_VOT_Metrics_Plan.csv")
     p.add_argument("--url", required=True)
     p.add_argument("--key", required=True)
+    p.add_argument("--diff", choices=DIFF_MODES, default="auto")
+    p.add_argument("--batch", type=int, default=BATCH)
+    p.add_argument("--inflight", type=int, default=INFLIGHT)
+    p.add_argument("--edges", action="store_true", help="also load the edge table")
     args = p.parse_args()
 
     sb = create_client(args.url, args.key)
 
-    with open(args.csv) as f:
-        reader = csv.DictReader(f)
-        rows = []
-        for r in reader:
-            day = int(r["Day"])
-            role = (r["VOT Name"].split(" – ")[0]).strip()
-            theme = r["Theme"]
-            rows.append({"day": day, "role": role, "theme": theme})
-
-    # Upsert in batches
-    for i in range(0, len(rows), 200):
-        batch = rows[i:i+200]
-        sb.table("vot").upsert(batch, on_conflict="day").execute()
-
-    print(f"Upserted {len(rows)} rows into vot")
+    # only inserted / changed / deleted rows are sent
+    tables = ("vot", "edge") if args.edges else ("vot",)
+    print_summary(load_csv(sb, args.csv, args.url, args.diff, tables, batch=args.batch, inflight=args.inflight))
 
 if __name__ == "__main__":
     main()
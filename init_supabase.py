@@ -1,6 +1,7 @@
 
-import os, sys, argparse, csv, json, time
+import os, sys, argparse
 from supabase import create_client
+from app.infra.bulk_load import DIFF_MODES, BATCH, INFLIGHT, load_csv, print_summary
 
 def run_sql(sb, sql: str):
     # supabase-py doesn't execute raw SQL directly; we rely on a PostgREST RPC workaround or ask the user to paste SQL.
@@ -20,31 +21,6 @@ def ensure_bucket(sb, bucket: str, public_url: str | None):
     except Exception as e:
         print("[warn] Could not verify/create bucket:", e)
 
-def upsert_vot(sb, csv_path: str):
-    with open(csv_path) as f:
-        reader = csv.DictReader(f)
-        rows = []
-        for r in reader:
-            day = int(r["Day"])
-            role = (r["VOT Name"].split(" – ")[0]).strip()
-            theme = r["Theme"]
-            rows.append({"day": day, "role": role, "theme": theme})
-    for i in range(0, len(rows), 200):
-        sb.table("vot").upsert(rows[i:i+200], on_conflict="day").execute()
-    print(f"[ok] Upserted {len(rows)} rows into vot")
-
-def upsert_edges(sb, csv_path: str):
-    edges = []
-    with open(csv_path) as f:
-        for row in csv.DictReader(f):
-            day = int(row["Day"])
-            deps = [int(x) for x in row["Dependencies (Day #)"].split(",") if x.strip().isdigit()]
-            for d in deps:
-                edges.append({"src": d, "dst": day})
-    for i in range(0, len(edges), 400):
-        sb.table("edge").upsert(edges[i:i+400]).execute()
-    print(f"[ok] Upserted {len(edges)} edges into edge")
-
 def main():
     p = argparse.ArgumentParser(description="QIL one-click Supabase init")
     p.add_argument("--csv", required=True, help="Path to QIL_365_VOT_Metrics_Plan.csv")
@@ -52,6 +28,10 @@ def main():
     p.add_argument("--key", default=os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
     p.add_argument("--bucket", default=os.getenv("QIL_BUCKET", "artifacts"))
     p.add_argument("--public_url", default=os.getenv("QIL_PUBLIC_URL"))
+    p.add_argument("--diff", choices=DIFF_MODES, default="auto",
+                   help="compare against the last-load snapshot (auto falls back to reading the tables); none = send everything")
+    p.add_argument("--batch", type=int, default=BATCH)
+    p.add_argument("--inflight", type=int, default=INFLIGHT, help="batches sent concurrently")
     args = p.parse_args()
     if not args.url or not args.key:
         print("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
@@ -64,9 +44,8 @@ def main():
     # 2) Ensure artifacts bucket exists
     ensure_bucket(sb, args.bucket, args.public_url)
 
-    # 3) Ingest vot + edge from CSV
-    upsert_vot(sb, args.csv)
-    upsert_edges(sb, args.csv)
+    # 3) Ingest vot + edge from CSV (only what changed since the last load)
+    print_summary(load_csv(sb, args.csv, args.url, args.diff, batch=args.batch, inflight=args.inflight))
 
     print("[done] Supabase init completed.")
 
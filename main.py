@@ -1,4 +1,5 @@
-import os, json, uuid, time
+import os, json, uuid, time, threading
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
 from flask import Flask, request, jsonify, render_template, send_from_directory, abort
@@ -6,31 +7,79 @@ from flask import Flask, request, jsonify, render_template, send_from_directory,
 APP_NAME = "Quantum Intelligence Lattice"
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
-SIGNALS_PATH = DATA_DIR / "signals.json"
+SIGNALS_PATH = DATA_DIR / "signals.json"  # legacy snapshot, migrated on first start
+SIGNALS_LOG = DATA_DIR / "signals.jsonl"
 MAX_SIGNALS = 500  # keep the file compact
 
-# load existing signals (if any)
-def load_signals():
-    if SIGNALS_PATH.exists():
-        try:
-            return json.loads(SIGNALS_PATH.read_text(encoding="utf-8"))
-        except Exception:
-            return []
-    return []
+class SignalStore:
+    """Last `capacity` signals in arrival order, backed by an append-only log.
 
-def save_signals(rows):
-    # trim to last N
-    rows = rows[-MAX_SIGNALS:]
-    SIGNALS_PATH.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    Each POST appends one line to the log; once the log holds twice the
+    capacity it is compacted back down to the ring buffer's contents.
+    """
+
+    def __init__(self, log_path: Path, capacity: int = MAX_SIGNALS):
+        self.log_path = log_path
+        self.capacity = capacity
+        self._rows = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._log_lines = 0
+        self._load()
+
+    def _load(self):
+        if not self.log_path.exists() and SIGNALS_PATH.exists():
+            try:
+                legacy = json.loads(SIGNALS_PATH.read_text(encoding="utf-8"))
+            except Exception:
+                legacy = []
+            self._rows.extend(sorted(legacy, key=lambda r: r.get("received_at", "")))
+            self._compact()
+            return
+        if self.log_path.exists():
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._rows.append(json.loads(line))
+                    except ValueError:
+                        continue  # torn last line
+                    self._log_lines += 1
+        if self._log_lines > self.capacity:
+            self._compact()
+
+    def _compact(self):
+        tmp = self.log_path.with_suffix(".tmp")
+        tmp.write_text("".join(json.dumps(r) + "\n" for r in self._rows), encoding="utf-8")
+        os.replace(tmp, self.log_path)
+        self._log_lines = len(self._rows)
+
+    def append(self, row: dict):
+        line = json.dumps(row) + "\n"
+        with self._lock:
+            self._rows.append(row)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._log_lines += 1
+            if self._log_lines >= 2 * self.capacity:
+                self._compact()
+
+    def latest(self, n: int | None = None) -> list:
+        # most recent first, without sorting
+        with self._lock:
+            if n is None or n >= len(self._rows):
+                return list(reversed(self._rows))
+            return [self._rows[-1 - i] for i in range(n)]
+
+    def __len__(self):
+        return len(self._rows)
 
-signals = load_signals()
+signals = SignalStore(SIGNALS_LOG)
 
 app = Flask(__name__)
 
 @app.get("/")
 def index():
     # most recent first
-    rows = sorted(signals, key=lambda r: r.get("received_at", ""), reverse=True)
+    rows = signals.latest()
     return render_template("index.html", app_name=APP_NAME, signals=rows)
 
 @app.get("/health")
@@ -67,7 +116,6 @@ def api_signal():
         "ua": request.headers.get("User-Agent", ""),
     }
     signals.append(row)
-    save_signals(signals)
     return {"ok": True, "stored": row["id"]}
 
 # simple static (optional)
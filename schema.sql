@@ -6,9 +6,13 @@ create table if not exists public.run (
   ok boolean,
   started_at timestamptz,
   finished_at timestamptz,
-  artifacts jsonb
+  artifacts jsonb,
+  fingerprint text
 );
 
+-- ledgers created before plan fingerprints existed
+alter table public.run add column if not exists fingerprint text;
+
 create table if not exists public.metric (
   id uuid primary key default gen_random_uuid(),
   day int not null,
@@ -28,11 +32,49 @@ create table if not exists public.edge (
   dst int not null
 );
 
+-- edges loaded before (src, dst) was unique: drop the duplicates, then enforce it
+delete from public.edge a using public.edge b
+  where a.ctid < b.ctid and a.src = b.src and a.dst = b.dst;
+create unique index if not exists edge_src_dst on public.edge(src, dst);
+
+-- Work leases for multi-instance orchestration (times are epoch seconds)
+create table if not exists public.lease (
+  plan text not null,
+  day int not null,
+  owner text,
+  state text not null default 'leased',
+  expires_at double precision,
+  updated_at double precision,
+  primary key (plan, day)
+);
+create index if not exists lease_plan_state on public.lease (plan, state, updated_at);
+
+-- finished rows older than p_since are a previous run's: failed ones can be claimed again, done ones with p_rerun_done
+drop function if exists public.claim_lease(text, int, text, double precision);
+create or replace function public.claim_lease(p_plan text, p_day int, p_owner text, p_ttl_seconds double precision,
+                                              p_since double precision default 0, p_rerun_done boolean default false)
+returns setof int language sql as $$
+  insert into public.lease as l (plan, day, owner, state, expires_at, updated_at)
+  values (p_plan, p_day, p_owner, 'leased', extract(epoch from now()) + p_ttl_seconds, extract(epoch from now()))
+  on conflict (plan, day) do update
+    set owner = excluded.owner, state = 'leased', expires_at = excluded.expires_at, updated_at = excluded.updated_at
+    where (l.state = 'leased' and l.expires_at < extract(epoch from now()))
+       or (l.updated_at < p_since and (l.state = 'failed' or (p_rerun_done and l.state = 'done')))
+  returning day;
+$$;
+
+create or replace function public.renew_leases(p_plan text, p_owner text, p_days int[], p_ttl_seconds double precision)
+returns void language sql as $$
+  update public.lease set expires_at = extract(epoch from now()) + p_ttl_seconds
+  where plan = p_plan and owner = p_owner and state = 'leased' and day = any(p_days);
+$$;
+
 -- RLS
 alter table public.run enable row level security;
 alter table public.metric enable row level security;
 alter table public.vot enable row level security;
 alter table public.edge enable row level security;
+alter table public.lease enable row level security;
 
 -- Read policies for anon (dashboard)
 do $$ begin
@@ -0,0 +1,179 @@
+import asyncio, threading, time
+from types import SimpleNamespace
+
+from app.infra.db_supabase import BufferedWriter
+
+
+class FakeClient:
+    """Records every PostgREST call; `gate` (when set) holds `execute` until it opens."""
+
+    def __init__(self, gate: threading.Event = None):
+        self.calls = []
+        self.gate = gate
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rows(self, table, op):
+        with self._lock:
+            return [rows for t, o, rows in self.calls if t == table and o == op]
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client, self.table, self.op, self.payload = client, table, None, None
+
+    def upsert(self, rows, on_conflict=None):
+        self.op, self.payload = "upsert", list(rows)
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", list(rows)
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def execute(self):
+        if self.client.gate is not None:
+            self.client.gate.wait(5)
+        with self.client._lock:
+            self.client.calls.append((self.table, self.op, self.payload))
+        return SimpleNamespace(data=[])
+
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.005)
+    return cond()
+
+
+def make(fake, **kw):
+    return BufferedWriter(client_factory=lambda: fake, retries=0, **kw)
+
+
+def test_flushes_when_batch_is_full():
+    fake = FakeClient()
+    w = make(fake, batch_size=3, interval=60)
+    for i in range(3):
+        w.add_metric(1, "k", i)
+    assert wait_for(lambda: fake.rows("metric", "insert"))
+    assert [len(r) for r in fake.rows("metric", "insert")] == [3]
+    w.close()
+
+
+def test_flushes_partial_batch_after_interval():
+    fake = FakeClient()
+    w = make(fake, batch_size=100, interval=0.05)
+    w.add_metric(1, "k", 1.0)
+    assert wait_for(lambda: fake.rows("metric", "insert"))
+    [[row]] = fake.rows("metric", "insert")
+    assert (row["day"], row["k"], row["v"]) == (1, "k", 1.0)
+    assert w.stats["requests"] == 1
+    w.close()
+
+
+def test_producers_block_when_buffer_is_full():
+    gate = threading.Event()
+    fake = FakeClient(gate)
+    w = make(fake, batch_size=2, interval=60, max_buffer=2)
+    added = []
+
+    def produce():
+        for i in range(6):
+            w.add_metric(1, "k", i)
+            added.append(i)
+
+    t = threading.Thread(target=produce, daemon=True)
+    t.start()
+    # two rows in flight (held by the gate) and two buffered: the fifth has to wait
+    assert wait_for(lambda: len(added) == 4)
+    time.sleep(0.1)
+    assert t.is_alive() and len(added) == 4
+    gate.set()
+    t.join(2)
+    assert not t.is_alive()
+    w.close()
+    assert sum(len(r) for r in fake.rows("metric", "insert")) == 6
+
+
+def test_start_and_finish_collapse_into_one_upsert():
+    fake = FakeClient()
+    w = make(fake, batch_size=100, interval=60)
+    rid = w.start_run(7, "fp")
+    w.finish_run(rid, True, {"html": "a.html"})
+    w.flush()
+    assert fake.rows("run", "update") == []
+    [[row]] = fake.rows("run", "upsert")
+    assert row["id"] == rid and row["day"] == 7 and row["fingerprint"] == "fp"
+    assert row["ok"] is True and row["artifacts"] == {"html": "a.html"}
+    assert row["started_at"] and row["finished_at"]
+    w.close()
+
+
+def test_finish_without_buffered_start_is_buffered_as_partial_upsert():
+    fake = FakeClient()
+    w = make(fake, batch_size=100, interval=60)
+    w.finish_run("started-elsewhere", False, {})
+    assert fake.calls == []
+    w.flush()
+    [[row]] = fake.rows("run", "upsert")
+    assert row["id"] == "started-elsewhere" and row["ok"] is False and "day" not in row
+    w.close()
+
+
+def test_flush_reports_dropped_rows_once():
+    class Failing(FakeClient):
+        def table(self, name):
+            raise RuntimeError("down")
+
+    w = make(Failing(), batch_size=100, interval=60)
+    w.add_metric(1, "k", 1.0)
+    assert w.flush() is False
+    assert w.stats["dropped"] == 1
+    assert w.flush() is True
+    w.close()
+
+
+def test_event_loop_is_not_blocked_by_a_full_buffer():
+    gate = threading.Event()
+    fake = FakeClient(gate)
+    w = make(fake, batch_size=2, interval=60, max_buffer=2)
+
+    async def producer():
+        for i in range(6):
+            await w.wait_room()
+            w.add_metric(1, "k", i)
+
+    async def main():
+        ticks = 0
+        task = asyncio.ensure_future(producer())
+        while ticks < 20:  # the loop keeps turning while the producer waits for room
+            await asyncio.sleep(0.005)
+            ticks += 1
+        assert not task.done()
+        gate.set()
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(main())
+    w.close()
+    assert sum(len(r) for r in fake.rows("metric", "insert")) == 6
+
+
+def test_metrics_keep_arrival_order_across_batches():
+    fake = FakeClient()
+    w = make(fake, batch_size=4, interval=60, max_buffer=1000)
+    for i in range(10):
+        w.add_metric(i, "k", float(i))
+    w.close()
+    batches = fake.rows("metric", "insert")
+    assert all(len(b) <= 4 for b in batches)
+    assert [r["v"] for b in batches for r in b] == [float(i) for i in range(10)]
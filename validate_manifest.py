@@ -1,11 +1,23 @@
 import json
 import os
-import requests
+import time
+import asyncio
+import argparse
+from collections import defaultdict
 from datetime import datetime
+from urllib.parse import urlsplit
+
+import httpx
 
 REQUIRED_FIELDS = {"id", "name", "type", "url", "description", "status"}
 MANIFEST_PATH = os.path.join("manifest", "nodes.json")
 HEARTBEAT_PATH = os.path.join("manifest", "heartbeat.json")
+CACHE_PATH = os.path.join("manifest", ".url_cache.json")
+
+CONCURRENCY = int(os.environ.get("QIL_VALIDATE_CONCURRENCY", "32"))
+PER_HOST = int(os.environ.get("QIL_VALIDATE_PER_HOST", "4"))
+TIMEOUT = float(os.environ.get("QIL_VALIDATE_TIMEOUT", "5"))
+CACHE_TTL = float(os.environ.get("QIL_VALIDATE_TTL", "900"))  # seconds a result is trusted without asking again
 
 def validate_structure(node):
     missing = REQUIRED_FIELDS - node.keys()
@@ -13,46 +25,138 @@ def validate_structure(node):
         return f"❌ Missing fields {missing} in node {node.get('id','?')}"
     return None
 
-def check_url(url):
-    try:
-        r = requests.head(url, allow_redirects=True, timeout=5)
-        if r.status_code < 400:
-            return None
-        return f"⚠️ URL {url} returned status {r.status_code}"
-    except Exception as e:
-        return f"⚠️ Could not resolve {url}: {e}"
 
-def write_heartbeat(count, errors):
+class UrlCache:
+    """Per-URL check results plus the validators (ETag / Last-Modified) to revalidate them."""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def fresh(self, url, now):
+        e = self.entries.get(url)
+        if e and now - e["checked_at"] < self.ttl:
+            return e
+        return None
+
+    def validators(self, url):
+        e = self.entries.get(url) or {}
+        headers = {}
+        if e.get("error") is None:
+            if e.get("etag"):
+                headers["If-None-Match"] = e["etag"]
+            if e.get("last_modified"):
+                headers["If-Modified-Since"] = e["last_modified"]
+        return headers
+
+    def put(self, url, entry):
+        self.entries[url] = entry
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+
+async def check_url(client, url, cache, host_limits, timeout=TIMEOUT):
+    # -> result dict with error=None when the URL resolves
+    now = time.time()
+    hit = cache.fresh(url, now)
+    if hit is not None:
+        return {**hit, "cached": True}
+    host = urlsplit(url).netloc
+    async with host_limits[host]:
+        t0 = time.perf_counter()
+        result = {"status_code": None, "etag": None, "last_modified": None, "error": None}
+        try:
+            r = await client.head(url, headers=cache.validators(url), timeout=timeout)
+            if r.status_code in (405, 501):
+                # some hosts refuse HEAD; ask for the body but don't read it
+                async with client.stream("GET", url, timeout=timeout) as r:
+                    pass
+            prev = cache.entries.get(url) or {}
+            if r.status_code == 304:
+                result.update(status_code=prev.get("status_code", 200), etag=prev.get("etag"),
+                              last_modified=prev.get("last_modified"), revalidated=True)
+            else:
+                result.update(status_code=r.status_code, etag=r.headers.get("etag"),
+                              last_modified=r.headers.get("last-modified"))
+                if r.status_code >= 400:
+                    result["error"] = f"⚠️ URL {url} returned status {r.status_code}"
+        except Exception as e:
+            result["error"] = f"⚠️ Could not resolve {url}: {e!r}"
+        result["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    result["checked_at"] = now
+    cache.put(url, result)
+    return {**result, "cached": False}
+
+
+async def check_nodes(nodes, cache, concurrency=CONCURRENCY, timeout=TIMEOUT, per_host=PER_HOST):
+    # every URL at once (bounded by `concurrency` and PER_HOST), so wall time ~ the slowest host
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+    async with httpx.AsyncClient(limits=limits, follow_redirects=True) as client:
+        urls = list(dict.fromkeys(n["url"] for n in nodes if n.get("url")))
+        results = await asyncio.gather(*(check_url(client, u, cache, host_limits, timeout) for u in urls))
+    return dict(zip(urls, results))
+
+
+def write_heartbeat(count, errors, nodes=None, duration_ms=None, path=HEARTBEAT_PATH):
     hb = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "nodes_checked": count,
         "status": "healthy" if not errors else "issues",
         "errors": errors
     }
-    with open(HEARTBEAT_PATH, "w", encoding="utf-8") as f:
+    if duration_ms is not None:
+        hb["duration_ms"] = duration_ms
+    if nodes is not None:
+        hb["nodes"] = nodes
+    with open(path, "w", encoding="utf-8") as f:
         json.dump(hb, f, indent=2)
-    print("💓 Heartbeat written:", HEARTBEAT_PATH)
+    print("💓 Heartbeat written:", path)
 
-def main():
-    if not os.path.exists(MANIFEST_PATH):
-        print(f"❌ Manifest file not found at {MANIFEST_PATH}")
-        return
+def validate(manifest_path=MANIFEST_PATH, heartbeat_path=HEARTBEAT_PATH, cache_path=CACHE_PATH,
+             ttl=CACHE_TTL, concurrency=CONCURRENCY, timeout=TIMEOUT, per_host=PER_HOST):
+    if not os.path.exists(manifest_path):
+        print(f"❌ Manifest file not found at {manifest_path}")
+        return None
 
-    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+    with open(manifest_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
     nodes = data.get("nodes", [])
     print(f"Validating {len(nodes)} nodes...")
 
-    errors = []
+    t0 = time.perf_counter()
+    cache = UrlCache(cache_path, ttl)
+    results = asyncio.run(check_nodes(nodes, cache, concurrency, timeout, per_host))
+    cache.save()
+
+    errors, report = [], []
     for node in nodes:
         # structure
         err = validate_structure(node)
         if err: errors.append(err)
 
         # url
-        url_err = check_url(node["url"])
-        if url_err: errors.append(url_err)
+        res = results.get(node.get("url"))
+        if res is None:
+            continue
+        if res["error"]: errors.append(res["error"])
+        report.append({"id": node.get("id"), "url": node["url"], "status_code": res["status_code"],
+                       "latency_ms": res["latency_ms"], "cached": res["cached"], "ok": res["error"] is None})
+    duration_ms = round((time.perf_counter() - t0) * 1000, 1)
 
     if not errors:
         print("✅ Manifest looks good -- all nodes valid and URLs resolve.")
@@ -60,8 +164,23 @@ def main():
         print("Found issues:")
         for e in errors:
             print(" -", e)
+    cached = sum(1 for r in report if r["cached"])
+    print(f"⏱  {duration_ms} ms ({cached} of {len(report)} URLs from cache)")
 
-    write_heartbeat(len(nodes), errors)
+    write_heartbeat(len(nodes), errors, report, duration_ms, heartbeat_path)
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate manifest/nodes.json and write manifest/heartbeat.json")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--heartbeat", default=HEARTBEAT_PATH)
+    parser.add_argument("--cache", default=CACHE_PATH, help="URL result cache ('' to disable)")
+    parser.add_argument("--ttl", type=float, default=CACHE_TTL, help="seconds before a cached URL is checked again")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=PER_HOST, help="concurrent checks against one host")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT)
+    args = parser.parse_args()
+    validate(args.manifest, args.heartbeat, args.cache, args.ttl, args.concurrency, args.timeout, args.per_host)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()